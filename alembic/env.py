@@ -0,0 +1,72 @@
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import async_engine_from_config
+from app.database import Base, SQLALCHEMY_DATABASE_URL
+import app.models  # noqa: F401, registers the tables on Base.metadata
+
+config = context.config
+target_metadata = Base.metadata
+
+# Created outside SQLAlchemy by app.api.search, SQLite only
+UNMANAGED_TABLES = {"request_search"}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if type_ == "table" and (name in UNMANAGED_TABLES or name.startswith("request_search_")):
+        return False
+    return True
+
+
+def do_run_migrations(connection: Connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite cannot ALTER most things in place, batch operations copy the table instead
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline():
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations():
+    section = config.get_section(config.config_ini_section, {})
+    section["sqlalchemy.url"] = section.get("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+    connectable = async_engine_from_config(section, prefix="sqlalchemy.", poolclass=pool.NullPool)
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await connectable.dispose()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Called by app.database.init_db on its own connection, inside the running event loop
+        do_run_migrations(connection)
+        return
+    asyncio.run(run_async_migrations())
+
+
+if config.config_file_name is not None and config.attributes.get("connection") is None:
+    # Only from the command line, the application has its own logging setup
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,156 @@
+"""baseline schema
+
+The tables as create_all built them before migrations existed. Databases
+created that way are stamped with this revision instead of running it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 19:25:16.954856
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        *timestamps(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "allowed_origins",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("origin", sa.String(), nullable=True),
+        *timestamps(),
+        sa.Column("owner_id", sa.Integer(), nullable=True),
+        sa.Column("disabled", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_allowed_origins_id", "allowed_origins", ["id"])
+    op.create_index("ix_allowed_origins_origin", "allowed_origins", ["origin"], unique=True)
+
+    op.create_table(
+        "chrome_sessions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=True),
+        *timestamps(),
+        sa.Column("proxy", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_chrome_sessions_id", "chrome_sessions", ["id"])
+    op.create_index("ix_chrome_sessions_session_id", "chrome_sessions", ["session_id"], unique=True)
+
+    op.create_table(
+        "requests",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("method", sa.String(), nullable=True),
+        sa.Column("url", sa.String(), nullable=True),
+        sa.Column("screenShotName", sa.String(), nullable=True),
+        sa.Column("string_response", sa.String(), nullable=True),
+        *timestamps(),
+        sa.Column("request_origin_id", sa.Integer(), nullable=True),
+        sa.Column("chrome_session_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["chrome_session_id"], ["chrome_sessions.id"]),
+        sa.ForeignKeyConstraint(["request_origin_id"], ["allowed_origins.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_requests_id", "requests", ["id"])
+
+    op.create_table(
+        "retention_policies",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("max_age_days", sa.Integer(), nullable=True),
+        sa.Column("max_rows", sa.Integer(), nullable=True),
+        sa.Column("max_bytes", sa.Integer(), nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_retention_policies_id", "retention_policies", ["id"])
+    op.create_index("ix_retention_policies_user_id", "retention_policies", ["user_id"], unique=True)
+
+    op.create_table(
+        "user_quotas",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("max_concurrent", sa.Integer(), nullable=True),
+        sa.Column("max_queued", sa.Integer(), nullable=True),
+        sa.Column("requests_per_minute", sa.Integer(), nullable=True),
+        sa.Column("weight", sa.Float(), nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_user_quotas_id", "user_quotas", ["id"])
+    op.create_index("ix_user_quotas_user_id", "user_quotas", ["user_id"], unique=True)
+
+    op.create_table(
+        "domain_profiles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("domain", sa.String(), nullable=True),
+        sa.Column("stats", sa.Text(), nullable=True),
+        *timestamps(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_domain_profiles_domain", "domain_profiles", ["domain"], unique=True)
+    op.create_index("ix_domain_profiles_id", "domain_profiles", ["id"])
+
+    op.create_table(
+        "cookie_jars",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("cookies", sa.Text(), nullable=True),
+        *timestamps(),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "name"),
+    )
+    op.create_index("ix_cookie_jars_id", "cookie_jars", ["id"])
+    op.create_index("ix_cookie_jars_user_id", "cookie_jars", ["user_id"])
+
+    if op.get_bind().dialect.name == "sqlite":
+        # Full-text index of the history, same statements as app.api.search at the time
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS request_search USING fts5("
+            "text, url, owner, tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS request_search_delete AFTER DELETE ON requests BEGIN "
+            "DELETE FROM request_search WHERE rowid = old.id; END"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS request_search_delete")
+        op.execute("DROP TABLE IF EXISTS request_search")
+    for table in ("cookie_jars", "domain_profiles", "user_quotas", "retention_policies", "requests", "chrome_sessions", "allowed_origins", "users"):
+        op.drop_table(table)
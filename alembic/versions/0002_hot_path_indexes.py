@@ -0,0 +1,38 @@
+"""indexes for the hot query paths
+
+- requests (user_id, created_at): history, export ranges and retention,
+  which filter on the user and order or cut on the creation time.
+- requests.chrome_session_id: requests of a session, and the foreign key
+  check when a session row is deleted.
+- chrome_sessions.user_id: sessions.list and /chrome-sessions/.
+- allowed_origins.owner_id: /allowed-hosts/.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 19:40:02.118204
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_requests_user_id_created_at", "requests", ["user_id", "created_at"]),
+    ("ix_requests_chrome_session_id", "requests", ["chrome_session_id"]),
+    ("ix_chrome_sessions_user_id", "chrome_sessions", ["user_id"]),
+    ("ix_allowed_origins_owner_id", "allowed_origins", ["owner_id"]),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        # A table create_all added to a legacy database already has them
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
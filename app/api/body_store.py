@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies up to this size stay in memory, larger ones roll over to a temporary file
+BODY_SPOOL_MEMORY = int(os.getenv("BODY_SPOOL_MEMORY", 1024 * 1024))
+BODY_SPOOL_DIR = os.getenv("BODY_SPOOL_DIR") or None
+# How long a body can be fetched after its task finished
+BODY_TTL_SECONDS = int(os.getenv("BODY_TTL_SECONDS", 600))
+# Seconds between two sweeps of expired bodies, so an idle server frees them too
+BODY_EXPIRE_INTERVAL = 60
+# Bodies larger than this are spooled even when the request did not ask for it, 0 disables
+BODY_STREAM_THRESHOLD = int(os.getenv("BODY_STREAM_THRESHOLD", 0))
+# Characters encoded per write, keeps a second full copy of the page out of memory
+ENCODE_CHUNK_CHARS = 256 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class SpooledBody:
+    """Page source of one task, kept once as UTF-8 bytes.
+
+    Written by the task's thread and read by the body endpoint, possibly by
+    several range requests at once: reads seek and read under a lock. Every
+    read holds a reference, a body dropped or expired while streaming is
+    only closed once its last read is done.
+    """
+
+    def __init__(self, text: str, content_type: str):
+        self.file = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_MEMORY, dir=BODY_SPOOL_DIR)
+        for start in range(0, len(text), ENCODE_CHUNK_CHARS):
+            self.file.write(text[start:start + ENCODE_CHUNK_CHARS].encode("utf-8", errors="replace"))
+        self.size = self.file.tell()
+        self.content_type = content_type
+        self.expires_at = time.monotonic() + BODY_TTL_SECONDS
+        self.lock = threading.Lock()
+        self.readers = 0
+        self.dropped = False
+
+    def acquire(self) -> Callable[[], None]:
+        """Hold the body open until the returned function is called, further calls do nothing."""
+        with self.lock:
+            self.readers += 1
+        released = False
+
+        def release():
+            nonlocal released
+            with self.lock:
+                if released:
+                    return
+                released = True
+                self.readers -= 1
+                if self.dropped and not self.readers:
+                    self.file.close()
+        return release
+
+    def read(self, start: int, end: int, release: Optional[Callable[[], None]] = None) -> Iterator[bytes]:
+        """Bytes start..end inclusive, in chunks, calling `release` once done."""
+        try:
+            position = start
+            while position <= end:
+                with self.lock:
+                    if self.file.closed:
+                        return
+                    self.file.seek(position)
+                    chunk = self.file.read(min(READ_CHUNK_SIZE, end - position + 1))
+                if not chunk:
+                    return
+                position += len(chunk)
+                yield chunk
+        finally:
+            if release is not None:
+                release()
+
+    def compressed(self, encoding: str, release: Optional[Callable[[], None]] = None) -> Iterator[bytes]:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=5)
+            compress, flush = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            compress, flush = compressor.compress, compressor.flush
+        for chunk in self.read(0, self.size - 1, release):
+            data = compress(chunk)
+            if data:
+                yield data
+        yield flush()
+
+    def close(self):
+        with self.lock:
+            self.dropped = True
+            if not self.readers:
+                self.file.close()
+
+
+def bodyContentType(headers: Dict[str, str]) -> str:
+    """Media type of the page from its response headers, the body itself is always UTF-8."""
+    content_type = next((value for name, value in (headers or {}).items() if name.lower() == "content-type"), "")
+    media_type = content_type.split(";")[0].strip() or "text/html"
+    return f"{media_type}; charset=utf-8"
+
+
+def parseRange(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single bytes range, None to send the whole body.
+
+    Multiple ranges are answered with the whole body, which RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # "bytes=-500" is the last 500 bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(f"bytes */{size}")
+    return start, end
+
+
+class BodyStore:
+    def __init__(self):
+        self.bodies: Dict[str, SpooledBody] = {}
+        self.lock = threading.Lock()
+
+    def put(self, task_id: str, body: SpooledBody):
+        with self.lock:
+            self.bodies[task_id] = body
+        self.expire()
+
+    def open(self, task_id: str) -> Optional[Tuple[SpooledBody, Callable[[], None]]]:
+        """The body and the function releasing the reference held for reading it."""
+        self.expire()
+        with self.lock:
+            body = self.bodies.get(task_id)
+            if body is None:
+                return None
+            return body, body.acquire()
+
+    def drop(self, task_id: str) -> bool:
+        with self.lock:
+            body = self.bodies.pop(task_id, None)
+        if body is None:
+            return False
+        body.close()
+        return True
+
+    def expire(self):
+        now = time.monotonic()
+        with self.lock:
+            expired = [task_id for task_id, body in self.bodies.items() if body.expires_at < now]
+        for task_id in expired:
+            self.drop(task_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"bodies": len(self.bodies), "bytes": sum(body.size for body in self.bodies.values())}
+
+
+async def bodyExpiryLoop():
+    """Background task started by the application lifespan."""
+    while True:
+        await asyncio.sleep(BODY_EXPIRE_INTERVAL)
+        try:
+            bodyStore.expire()
+        except Exception as e:
+            logger.warning("Could not expire bodies: %s", e)
+
+
+def spoolResult(task_id: str, result: Dict, stream_body: Optional[bool]) -> Dict:
+    """Move the page source of a result into the body store.
+
+    Returns the result with `response` replaced by a `body` descriptor. The
+    result may be shared with the result cache, so it is copied, not edited.
+    This runs once the solve is done: until then the page is a str in the
+    result like any other, the saving is in what task_results keeps and what
+    the JSON encoder never sees.
+    """
+    solution = result.get("solution")
+    if not isinstance(solution, dict) or not isinstance(solution.get("response"), str):
+        return result
+    text = solution["response"]
+    if stream_body is None:
+        stream_body = BODY_STREAM_THRESHOLD > 0 and len(text) > BODY_STREAM_THRESHOLD
+    if not stream_body:
+        return result
+    body = SpooledBody(text, bodyContentType(solution.get("headers")))
+    bodyStore.put(task_id, body)
+    descriptor = {"size": body.size, "contentType": body.content_type, "href": f"/api/v1/tasks/{task_id}/body"}
+    solution = {key: value for key, value in solution.items() if key != "response"}
+    solution["body"] = descriptor
+    return {**result, "solution": solution}
+
+
+bodyStore = BodyStore()
@@ -0,0 +1,157 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from app.api.responses import dumpJson
+from app.api.deadline import Deadline
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# How often a coalesced follower looks at its own deadline and cancel event
+FOLLOWER_POLL_INTERVAL = 0.5
+
+
+def normalizeUrl(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def cacheKey(url: str, options: Dict[str, Any]) -> str:
+    """Key a request on its normalized URL and every option that changes the output."""
+    payload = json.dumps({"url": normalizeUrl(url), "options": options}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """LRU cache of request.get results with single-flight coalescing.
+
+    Every v1 task runs on its own thread and event loop, so entries and
+    in-flight solves are guarded by a thread lock and shared through
+    concurrent futures rather than asyncio primitives.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int, max_age: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.size = 0
+        self.inflight: Dict[str, concurrent.futures.Future] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: str, max_age: int) -> Optional[tuple]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored_at, size, value = entry
+            age = time.time() - stored_at
+            if age > self.max_age:
+                self._evict(key)
+                return None
+            if age > max_age:
+                return None
+            self.entries.move_to_end(key)
+            return value, age
+
+    def put(self, key: str, value: Dict[str, Any]):
+        size = len(dumpJson(value))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._evict(key)
+            self.entries[key] = (time.time(), size, value)
+            self.size += size
+            while self.entries and (self.size > self.max_bytes or len(self.entries) > self.max_entries):
+                self._evict(next(iter(self.entries)))
+
+    def _evict(self, key: str):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    async def getOrSolve(self, key: str, max_age: int, solve: Callable[[], Awaitable[Dict[str, Any]]], deadline: Optional[Deadline] = None, on_start: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        while True:
+            cached = self.get(key, max_age)
+            if cached is not None:
+                self.hits += 1
+                return self._flagged(*cached)
+            with self.lock:
+                future = self.inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self.inflight[key] = future
+            if leader:
+                return await self._lead(key, future, solve)
+            # An identical request is already navigating, share its result
+            self.coalesced += 1
+            if on_start is not None:
+                on_start()
+            value = await self._follow(future, deadline)
+            if value is not None:
+                return self._flagged(value, 0.0)
+            # The leader was cancelled, timed out or over its quota: solve for ourselves
+
+    async def _lead(self, key: str, future: concurrent.futures.Future, solve: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.misses += 1
+        shared = None
+        try:
+            value = await solve()
+            # Errors belong to the leader's own deadline, cancellation or quota
+            if "error" not in value:
+                self.put(key, value)
+                shared = value
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            if not future.done():
+                future.set_result(shared)
+
+    async def _follow(self, future: concurrent.futures.Future, deadline: Optional[Deadline]) -> Optional[Dict[str, Any]]:
+        # Shielded by asyncio.wait: a follower giving up must never cancel the shared future
+        waiting = asyncio.wrap_future(future)
+        while not waiting.done():
+            await asyncio.wait({waiting}, timeout=deadline.budget(FOLLOWER_POLL_INTERVAL) if deadline is not None else FOLLOWER_POLL_INTERVAL)
+            if deadline is not None and not waiting.done():
+                deadline.check("queueing")
+        return waiting.result()
+
+    def _flagged(self, value: Dict[str, Any], age: float) -> Dict[str, Any]:
+        if "solution" not in value:
+            return value
+        solution = dict(value["solution"], cached=True, cacheAge=round(age, 3))
+        return dict(value, solution=solution)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "inflight": len(self.inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
+
+
+resultCache = ResultCache(
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 10000)),
+    max_age=int(os.getenv("RESULT_CACHE_MAX_AGE", 3600)),
+)
@@ -0,0 +1,174 @@
+import datetime
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List
+from app.schemas import CaptureOptions
+
+MAX_CAPTURE_ENTRIES = 2000
+MAX_CAPTURE_BODY_SIZE = 5 * 1024 * 1024
+
+
+def parseCaptureSpec(capture: Any) -> CaptureOptions:
+    """Validate the `capture` option of request.get, `true` selects the defaults."""
+    options = CaptureOptions() if capture is True else CaptureOptions(**capture)
+    if options.format not in ("har", "list"):
+        raise ValueError(f"unknown format {options.format}")
+    if not 0 < options.maxEntries <= MAX_CAPTURE_ENTRIES:
+        raise ValueError(f"maxEntries must be between 1 and {MAX_CAPTURE_ENTRIES}")
+    if not 0 <= options.maxBodySize <= MAX_CAPTURE_BODY_SIZE:
+        raise ValueError(f"maxBodySize must be between 0 and {MAX_CAPTURE_BODY_SIZE}")
+    if options.urlPattern:
+        re.compile(options.urlPattern)
+    return options
+
+
+def headerList(headers) -> List[Dict[str, str]]:
+    return [{"name": name, "value": str(value)} for name, value in dict(headers or {}).items()]
+
+
+class NetworkCapture:
+    """Records the requests of a page into a bounded ring buffer.
+
+    Only the fields needed for the export are copied out of each CDP event,
+    and the oldest entry is dropped once `maxEntries` is reached, so pages
+    that fire thousands of requests keep a fixed memory footprint.
+    """
+
+    def __init__(self, network, options: CaptureOptions):
+        self.network = network
+        self.options = options
+        self.url_pattern = re.compile(options.urlPattern) if options.urlPattern else None
+        self.types = {resource_type.lower() for resource_type in options.types} if options.types else None
+        self.entries: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self.dropped = 0
+
+    def attach(self, page):
+        page.add_handler(self.network.RequestWillBeSent, self.on_request)
+        page.add_handler(self.network.ResponseReceived, self.on_response)
+        page.add_handler(self.network.LoadingFinished, self.on_finished)
+        page.add_handler(self.network.LoadingFailed, self.on_failed)
+
+    def detach(self, page):
+        page.remove_handler(self.network.RequestWillBeSent, self.on_request)
+        page.remove_handler(self.network.ResponseReceived, self.on_response)
+        page.remove_handler(self.network.LoadingFinished, self.on_finished)
+        page.remove_handler(self.network.LoadingFailed, self.on_failed)
+
+    def matches(self, url: str, resource_type) -> bool:
+        if self.url_pattern and not self.url_pattern.search(url):
+            return False
+        if self.types is not None and (resource_type is None or resource_type.value.lower() not in self.types):
+            return False
+        return True
+
+    def on_request(self, event):
+        if not self.matches(event.request.url, event.type_):
+            return
+        if event.request_id in self.entries:
+            # Redirect: the same request id is reused for the next hop
+            return
+        if len(self.entries) >= self.options.maxEntries:
+            self.entries.popitem(last=False)
+            self.dropped += 1
+        self.entries[event.request_id] = {
+            "started": float(event.wall_time),
+            "timestamp": float(event.timestamp),
+            "type": event.type_.value if event.type_ else None,
+            "method": event.request.method,
+            "url": event.request.url,
+            "requestHeaders": dict(event.request.headers or {}),
+            "postData": event.request.post_data,
+        }
+
+    def on_response(self, event):
+        entry = self.entries.get(event.request_id)
+        if entry is None:
+            return
+        response = event.response
+        entry.update({
+            "status": response.status,
+            "statusText": response.status_text,
+            "responseHeaders": dict(response.headers or {}),
+            "mimeType": response.mime_type,
+            "protocol": response.protocol,
+        })
+
+    def on_finished(self, event):
+        entry = self.entries.get(event.request_id)
+        if entry is None:
+            return
+        entry["finished"] = True
+        entry["size"] = int(event.encoded_data_length)
+        entry["time"] = round((float(event.timestamp) - entry["timestamp"]) * 1000, 3)
+
+    def on_failed(self, event):
+        entry = self.entries.get(event.request_id)
+        if entry is not None:
+            entry["error"] = event.error_text
+
+    async def fetch_bodies(self, page, deadline):
+        if not self.options.bodies:
+            return
+        for request_id, entry in list(self.entries.items()):
+            if deadline.expired():
+                return
+            if not entry.get("finished") or entry.get("size", 0) > self.options.maxBodySize:
+                continue
+            try:
+                body, base64_encoded = await page.get_response_body(request_id)
+            except Exception as e:
+                entry["bodyError"] = str(e)
+                continue
+            entry["body"] = body
+            entry["bodyEncoding"] = "base64" if base64_encoded else None
+
+    def export(self) -> Dict[str, Any]:
+        if self.options.format == "har":
+            return {"log": self.to_har(), "dropped": self.dropped}
+        return {"entries": self.to_list(), "dropped": self.dropped}
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        keys = ("method", "url", "type", "status", "mimeType", "size", "time", "error", "body", "bodyEncoding")
+        return [{key: entry[key] for key in keys if entry.get(key) is not None} for entry in self.entries.values()]
+
+    def to_har(self) -> Dict[str, Any]:
+        entries = []
+        for entry in self.entries.values():
+            content = {"size": entry.get("size", -1), "mimeType": entry.get("mimeType", "")}
+            if "body" in entry:
+                content["text"] = entry["body"]
+                if entry["bodyEncoding"]:
+                    content["encoding"] = entry["bodyEncoding"]
+            entries.append({
+                "startedDateTime": datetime.datetime.fromtimestamp(entry["started"], datetime.timezone.utc).isoformat(),
+                "time": entry.get("time", -1),
+                "_resourceType": entry["type"],
+                "request": {
+                    "method": entry["method"],
+                    "url": entry["url"],
+                    "httpVersion": entry.get("protocol", ""),
+                    "headers": headerList(entry["requestHeaders"]),
+                    "queryString": [],
+                    "cookies": [],
+                    "headersSize": -1,
+                    "bodySize": len(entry["postData"]) if entry["postData"] else 0,
+                },
+                "response": {
+                    "status": entry.get("status", 0),
+                    "statusText": entry.get("statusText", entry.get("error", "")),
+                    "httpVersion": entry.get("protocol", ""),
+                    "headers": headerList(entry.get("responseHeaders")),
+                    "cookies": [],
+                    "content": content,
+                    "redirectURL": "",
+                    "headersSize": -1,
+                    "bodySize": entry.get("size", -1),
+                },
+                "cache": {},
+                "timings": {"send": 0, "wait": entry.get("time", -1), "receive": 0},
+            })
+        return {
+            "version": "1.2",
+            "creator": {"name": "CloudScrapper", "version": "1.0.0"},
+            "entries": entries,
+        }
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import CookieJar
+
+# Cookies kept per jar, the ones expiring first are dropped beyond it
+COOKIE_JAR_MAX_COOKIES = int(os.getenv("COOKIE_JAR_MAX_COOKIES", 500))
+COOKIE_JAR_NAME_MAX_LENGTH = 64
+# Writes retried when another request changed the jar between our read and our write
+COOKIE_JAR_WRITE_ATTEMPTS = 5
+MAX_EXTRA_HEADERS = 50
+SAME_SITE_VALUES = ("Strict", "Lax", "None")
+# Set by Chrome itself, CDP refuses them in Network.setExtraHTTPHeaders
+FORBIDDEN_HEADERS = {"host", "content-length", "connection", "transfer-encoding"}
+
+
+class CookieJarBusy(Exception):
+    """The jar kept changing under every write attempt."""
+
+
+def normalizeCookie(cookie: Dict[str, Any], url: Optional[str] = None) -> Dict[str, Any]:
+    """A cookie in the shape of a CDP Network.CookieParam.
+
+    Accepts the cookies of a solution as well as the minimal {name, value}
+    form. A cookie without a domain is scoped to `url`.
+    """
+    if not isinstance(cookie, dict) or not isinstance(cookie.get("name"), str) or not isinstance(cookie.get("value"), str):
+        raise ValueError("every cookie needs a string name and value")
+    param = {"name": cookie["name"], "value": cookie["value"]}
+    if cookie.get("domain"):
+        param["domain"] = str(cookie["domain"])
+        param["path"] = str(cookie.get("path") or "/")
+    elif cookie.get("url") or url:
+        param["url"] = str(cookie.get("url") or url)
+    else:
+        raise ValueError(f"cookie {cookie['name']} needs a domain")
+    expires = cookie.get("expires")
+    if expires is not None:
+        if not isinstance(expires, (int, float)):
+            raise ValueError(f"expires of cookie {cookie['name']} must be a unix timestamp")
+        # -1 is how CDP reports session cookies
+        if expires > 0:
+            param["expires"] = float(expires)
+    for field in ("secure", "httpOnly"):
+        if cookie.get(field) is not None:
+            param[field] = bool(cookie[field])
+    if cookie.get("sameSite") is not None:
+        if cookie["sameSite"] not in SAME_SITE_VALUES:
+            raise ValueError(f"sameSite must be one of {', '.join(SAME_SITE_VALUES)}")
+        param["sameSite"] = cookie["sameSite"]
+    return param
+
+
+def normalizeCookies(cookies: Any, url: Optional[str] = None) -> List[Dict[str, Any]]:
+    if not isinstance(cookies, list):
+        raise ValueError("cookies must be an array")
+    return [normalizeCookie(cookie, url) for cookie in cookies]
+
+
+def normalizeHeaders(headers: Any) -> Dict[str, str]:
+    if not isinstance(headers, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in headers.items()):
+        raise ValueError("headers must be an object of strings")
+    if len(headers) > MAX_EXTRA_HEADERS:
+        raise ValueError(f"at most {MAX_EXTRA_HEADERS} headers")
+    forbidden = [name for name in headers if name.lower() in FORBIDDEN_HEADERS]
+    if forbidden:
+        raise ValueError(f"{', '.join(forbidden)} cannot be set")
+    return headers
+
+
+def cookieKey(cookie: Dict[str, Any]):
+    host = cookie.get("domain") or urlsplit(cookie.get("url", "")).hostname or ""
+    return cookie["name"], host.lstrip("."), cookie.get("path", "/")
+
+
+def mergeCookies(*layers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Cookies of every layer, later layers overriding same name, domain and path."""
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    now = time.time()
+    for layer in layers:
+        for cookie in layer:
+            merged[cookieKey(cookie)] = cookie
+    live = [cookie for cookie in merged.values() if cookie.get("expires", now + 1) > now]
+    if len(live) > COOKIE_JAR_MAX_COOKIES:
+        # Session cookies (no expires) sort last and are kept first
+        live.sort(key=lambda cookie: cookie.get("expires", float("inf")), reverse=True)
+        live = live[:COOKIE_JAR_MAX_COOKIES]
+    return live
+
+
+def cookiesForUrl(cookies: List[Dict[str, Any]], url: str) -> List[Dict[str, Any]]:
+    """The cookies a plain HTTP client should send to `url`, with their domain and path."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    selected = []
+    for cookie in cookies:
+        domain = (cookie.get("domain") or urlsplit(cookie.get("url", "")).hostname or host).lstrip(".").lower()
+        if (host == domain or host.endswith("." + domain)) and path.startswith(cookie.get("path", "/")):
+            selected.append(cookie)
+    return selected
+
+
+def validJarName(name: Any) -> bool:
+    return isinstance(name, str) and 0 < len(name) <= COOKIE_JAR_NAME_MAX_LENGTH
+
+
+async def getCookieJar(db: AsyncSession, user_id: int, name: str) -> Optional[CookieJar]:
+    result = await db.execute(select(CookieJar).where(CookieJar.user_id == user_id, CookieJar.name == name))
+    return result.scalar_one_or_none()
+
+
+def jarCookies(jar: Optional[CookieJar]) -> List[Dict[str, Any]]:
+    # Expired cookies are dropped on the way out rather than by a sweep
+    return mergeCookies(json.loads(jar.cookies)) if jar is not None and jar.cookies else []
+
+
+async def loadCookieJar(db: AsyncSession, user_id: int, name: str) -> List[Dict[str, Any]]:
+    return jarCookies(await getCookieJar(db, user_id, name))
+
+
+async def storeCookieJar(db: AsyncSession, user_id: int, name: str, cookies: List[Dict[str, Any]], replace: bool = False, url: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Merge `cookies` into the jar, creating it on first use.
+
+    Cookies without a domain are scoped to `url` when it is given.
+
+    The write only lands if the jar still holds what the merge was based on,
+    otherwise it is merged again, so concurrent solves never drop each
+    other's cookies. Raises CookieJarBusy when the jar keeps changing.
+    """
+    cookies = [normalizeCookie(cookie, url) for cookie in cookies]
+    try:
+        for _ in range(COOKIE_JAR_WRITE_ATTEMPTS):
+            current = (await db.execute(
+                select(CookieJar.id, CookieJar.cookies).where(CookieJar.user_id == user_id, CookieJar.name == name)
+            )).first()
+            if current is None:
+                stored = mergeCookies(cookies)
+                # Another request may create the same jar first, then we merge into theirs
+                written = await db.execute(
+                    insert(CookieJar)
+                    .values(user_id=user_id, name=name, cookies=json.dumps(stored))
+                    .on_conflict_do_nothing(index_elements=["user_id", "name"])
+                )
+            else:
+                existing = mergeCookies(json.loads(current.cookies)) if current.cookies else []
+                stored = mergeCookies(cookies) if replace else mergeCookies(existing, cookies)
+                written = await db.execute(
+                    update(CookieJar)
+                    .where(CookieJar.id == current.id, CookieJar.cookies == current.cookies)
+                    .values(cookies=json.dumps(stored))
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+            if written.rowcount:
+                return stored
+    except Exception:
+        await db.rollback()
+        raise
+    raise CookieJarBusy(f"cookie jar {name} is being updated concurrently, try again")
+
+
+async def listCookieJars(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(select(CookieJar).where(CookieJar.user_id == user_id).order_by(CookieJar.name))
+    return [
+        {"name": jar.name, "cookies": len(jarCookies(jar)), "updated_at": jar.updated_at or jar.created_at}
+        for jar in result.scalars()
+    ]
+
+
+async def deleteCookieJar(db: AsyncSession, user_id: int, name: str) -> bool:
+    jar = await getCookieJar(db, user_id, name)
+    if jar is None:
+        return False
+    await db.delete(jar)
+    await db.commit()
+    return True
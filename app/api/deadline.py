@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+# Longest stretch a wait goes without looking at the cancel flag
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Timeout after {timeout:g}s during {stage}")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class TaskCancelled(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"Task cancelled during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """End-to-end budget for a request, measured from the moment it was submitted.
+
+    `maxTimeout` covers queueing, navigation and actions together, so every
+    stage asks the deadline how long it may wait instead of using a fixed value.
+    The same checkpoints stop the request once its task has been cancelled.
+    """
+
+    def __init__(self, timeout: float, started_at: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        self.timeout = timeout
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.expires_at = self.started_at + timeout
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def budget(self, seconds: float) -> float:
+        """Clip a wait to what is left of the deadline."""
+        return min(seconds, self.remaining())
+
+    def check(self, stage: str):
+        if self.cancel_event.is_set():
+            raise TaskCancelled(stage)
+        if self.expired():
+            raise DeadlineExceeded(stage, self.timeout)
+
+    async def sleep(self, seconds: float, stage: str):
+        """Yield to the event loop for up to `seconds`, returning early on cancellation."""
+        until = time.monotonic() + self.budget(seconds)
+        while not self.cancel_event.is_set() and time.monotonic() < until:
+            await asyncio.sleep(min(CANCEL_POLL_INTERVAL, until - time.monotonic()))
+        self.check(stage)
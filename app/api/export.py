@@ -0,0 +1,123 @@
+import base64
+import csv
+import datetime
+import io
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+from sqlalchemy import select
+from app.api.responses import dumpJson
+from app.database import AsyncSessionLocal
+from app.models import Request
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ("id", "created_at", "method", "url", "status_code", "request_origin_id", "chrome_session_id", "screenShotName")
+# Rows fetched per round trip to the database cursor
+EXPORT_BATCH_SIZE = 500
+# Output is flushed to the client in chunks of about this size
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def urlPatternToLike(pattern: str) -> str:
+    # "https://example.com/*/items" -> LIKE pattern, * matches anything
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%")
+
+
+def toUtc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # created_at is stored as naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def exportQuery(
+    user_id: int,
+    since: Optional[datetime.datetime],
+    until: Optional[datetime.datetime],
+    statuses: Optional[List[int]],
+    url_pattern: Optional[str],
+    include_body: bool,
+):
+    columns = [getattr(Request, column) for column in EXPORT_COLUMNS]
+    if include_body:
+        columns.append(Request.string_response)
+    query = select(*columns).where(Request.user_id == user_id)
+    if since is not None:
+        query = query.where(Request.created_at >= toUtc(since))
+    if until is not None:
+        query = query.where(Request.created_at < toUtc(until))
+    if statuses:
+        query = query.where(Request.status_code.in_(statuses))
+    if url_pattern:
+        query = query.where(Request.url.like(urlPatternToLike(url_pattern), escape="\\"))
+    # Index order of ix_requests_user_id_created_at, so rows stream without a sort first
+    return query.order_by(Request.created_at, Request.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def decodeBody(stored: Optional[str]) -> Optional[str]:
+    if stored is None:
+        return None
+    try:
+        return base64.b64decode(stored).decode("utf-8", errors="replace")
+    except ValueError:
+        return stored
+
+
+def rowToDict(row, include_body: bool) -> Dict[str, Any]:
+    record = {column: getattr(row, column) for column in EXPORT_COLUMNS}
+    if record["created_at"] is not None:
+        record["created_at"] = record["created_at"].isoformat()
+    if include_body:
+        record["body"] = decodeBody(row.string_response)
+    return record
+
+
+async def exportRequests(
+    user_id: int,
+    export_format: str,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    statuses: Optional[List[int]] = None,
+    url_pattern: Optional[str] = None,
+    include_body: bool = False,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """Stream the user's request history as NDJSON or CSV.
+
+    Rows come from a server-side cursor in batches and are written out in
+    chunks as they arrive, so memory stays flat whatever the row count.
+    The session is opened here rather than taken from the route because
+    the response outlives the route's dependencies.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS + (("body",) if include_body else ()))
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    query = exportQuery(user_id, since, until, statuses, url_pattern, include_body)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query)
+        async for row in result:
+            record = rowToDict(row, include_body)
+            if writer is not None:
+                writer.writerow(record.values())
+            else:
+                buffer.write(dumpJson(record).decode())
+                buffer.write("\n")
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,87 @@
+import json
+from typing import Dict, Any, Tuple
+from app.schemas import ExtractField
+
+EXTRACT_TYPES = ("text", "attribute", "html")
+MAX_EXTRACT_FIELDS = 50
+MAX_EXTRACT_QUERY_LENGTH = 500
+
+# Evaluated in the page in a single CDP round trip. Every field is resolved
+# independently so that one bad selector does not fail the whole extraction.
+EXTRACT_SCRIPT = """
+(() => {
+    const spec = %s;
+    const pick = (node, field) => {
+        if (node.nodeType !== Node.ELEMENT_NODE) {
+            return node.textContent;
+        }
+        if (field.type === "html") {
+            return node.outerHTML;
+        }
+        if (field.type === "attribute") {
+            return node.getAttribute(field.attribute);
+        }
+        const text = node.innerText !== undefined ? node.innerText : node.textContent;
+        return text === null ? null : text.trim();
+    };
+    const find = (field) => {
+        if (field.xpath) {
+            const snapshot = document.evaluate(field.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < snapshot.snapshotLength; i++) {
+                nodes.push(snapshot.snapshotItem(i));
+            }
+            return nodes;
+        }
+        return Array.from(document.querySelectorAll(field.selector));
+    };
+    const values = {};
+    const errors = {};
+    for (const [name, field] of Object.entries(spec)) {
+        try {
+            const nodes = find(field);
+            values[name] = field.multiple ? nodes.map((node) => pick(node, field)) : (nodes.length ? pick(nodes[0], field) : null);
+        } catch (e) {
+            values[name] = null;
+            errors[name] = String(e);
+        }
+    }
+    return JSON.stringify({values, errors});
+})()
+"""
+
+
+def parseExtractSpec(extract: Any) -> Dict[str, ExtractField]:
+    """Validate the `extract` option of request.get.
+
+    Each entry maps a result name either to a CSS selector string or to an
+    object with `selector` or `xpath`, an optional `type` (text, attribute,
+    html) and `multiple` to return every match as a list.
+    """
+    if not isinstance(extract, dict) or not extract:
+        raise ValueError("extract must be a non-empty object")
+    if len(extract) > MAX_EXTRACT_FIELDS:
+        raise ValueError(f"Too many extract fields ({MAX_EXTRACT_FIELDS} max)")
+    fields = {}
+    for name, value in extract.items():
+        field = ExtractField(selector=value) if isinstance(value, str) else ExtractField(**value)
+        if bool(field.selector) == bool(field.xpath):
+            raise ValueError(f"{name}: exactly one of selector or xpath is required")
+        if len(field.selector or field.xpath) > MAX_EXTRACT_QUERY_LENGTH:
+            raise ValueError(f"{name}: query too long ({MAX_EXTRACT_QUERY_LENGTH} max)")
+        if field.type not in EXTRACT_TYPES:
+            raise ValueError(f"{name}: unknown type {field.type}")
+        if field.type == "attribute" and not field.attribute:
+            raise ValueError(f"{name}: attribute is required for type attribute")
+        fields[name] = field
+    return fields
+
+
+def buildExtractScript(fields: Dict[str, ExtractField]) -> str:
+    spec = {name: field.model_dump() for name, field in fields.items()}
+    return EXTRACT_SCRIPT % json.dumps(spec)
+
+
+def parseExtractResult(raw: Any) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    result = json.loads(raw) if isinstance(raw, str) else raw
+    return result.get("values", {}), result.get("errors", {})
@@ -1,28 +1,50 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-import mycdp.network
 import os
 import base64
+import json
 import datetime
 from app.models import AllowedOrigin, Request, ChromeSession
-from app.schemas import BrowserAction
-from app.util import verifyStringIsProxy
-from app.browser_manager.manager import newSession, deleteSession, getSession, NewDriver
-import mycdp
+from app.schemas import BrowserAction, ExtractField, CaptureOptions
+from app.util import verifyStringIsProxy, isTruthy
+from app.api.extract import parseExtractSpec, buildExtractScript, parseExtractResult
+from app.api.responses import parseFields, projectSolution
+from app.api.cache import resultCache, cacheKey
+from app.api.throttle import domainThrottle
+from app.api.scheduler import QuotaExceeded, fairScheduler, loadQuota
+from app.api.deadline import Deadline, DeadlineExceeded, TaskCancelled
+from app.api.http_engine import INTERSTITIAL_MARKERS, FETCH_ENGINES, HttpFetchError, httpFetch
+from app.api.cookie_jar import cookiesForUrl, loadCookieJar, mergeCookies, normalizeCookies, normalizeHeaders, storeCookieJar, validJarName
+from app.api.profiles import DEFAULT_SETTLE_SECONDS, SolvePlan, domainProfiles, loadProfile, recordOutcome
+from app.api.capture import NetworkCapture, parseCaptureSpec
+from app.api.search import indexRequest
+from app.api.replay import RECORD_DIR, newRecorder, saveRecording
+from app.browser_manager.manager import newSession, deleteSession, getSession, NewDriver, SESSION_MAX_TABS, engineSupportsTabs
+from app.browser_manager.session_queue import SessionBusy, SessionClosed
 from uuid import uuid4
 
-import asyncio
-from seleniumbase import SB
+import threading
 import time
-async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) -> Dict[str, Any]:
+import logging
+from app.logging_config import origin_var, session_id_var
+
+logger = logging.getLogger(__name__)
+
+# Sleep between two looks at a challenge page while it clears
+CLEARANCE_POLL_INTERVAL = 0.5
+# Status code of the request history row of a cancelled task, as for a client closing the connection
+CANCELLED_STATUS_CODE = 499
+
+async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession, submitted_at: Optional[float] = None, cancel_event: Optional[threading.Event] = None, on_start: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
     is_allowed_host = await db.execute(
         select(AllowedOrigin)
         .options(joinedload(AllowedOrigin.owner))
         .where(AllowedOrigin.origin == ip)
     )
     result = is_allowed_host.scalar_one_or_none()
+    origin_var.set(ip)
     if not result:
         return {"error": f"Not allowed ip {ip}"}
     
@@ -32,6 +54,14 @@ async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) ->
         proxy = data.get("proxy")
         if not session:
             session = uuid4().hex
+        try:
+            tabs = int(data.get("tabs", 1))
+        except (TypeError, ValueError):
+            return {"error": "tabs must be an integer"}
+        if not 1 <= tabs <= SESSION_MAX_TABS:
+            return {"error": f"tabs must be between 1 and {SESSION_MAX_TABS}"}
+        if tabs > 1 and not engineSupportsTabs():
+            return {"error": "Parallel tabs require the nodriver browser engine"}
         chromeSession = ChromeSession(session_id=session, user_id=result.owner.id)
         if proxy:
             if not verifyStringIsProxy(proxy):
@@ -40,10 +70,11 @@ async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) ->
         db.add(chromeSession)
         await db.commit()
         await db.refresh(chromeSession)
-        print(f"Creating session {session} for user {result.owner.id}")
-        await newSession(chromeSession)
-        print(f"Session {session} created")
-        return {"session": session}
+        session_id_var.set(session)
+        logger.info("Creating session %s for user %s", session, result.owner.id)
+        await newSession(chromeSession, tabs)
+        logger.info("Session %s created with %d tab(s)", session, tabs)
+        return {"session": session, "tabs": tabs}
     if cmd == "sessions.destroy":
         session = data.get("session")
         if not session:
@@ -66,11 +97,11 @@ async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) ->
         sessions = [session.session_id for session in sessions]
         return {"sessions": sessions}
     if cmd == "request.get":
-        start = time.time()
         url = data.get("url")
         if not url:
             return {"error": "URL is required"}
         session_id = data.get("session")
+        session_id_var.set(session_id)
         chrome_session = None
         if session_id:
             chrome_session = await db.execute(
@@ -84,7 +115,6 @@ async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) ->
         cookies = data.get("cookies", [])
         actions = data.get("actions", [])
         parsed_actions = []
-        response_values = []
         if actions:
             if not isinstance(actions, list):
                 return {"error": "Actions must be an array"}
@@ -94,68 +124,242 @@ async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) ->
                     parsed_actions.append(action)
             except Exception as e:
                 return {"error": f"Invalid action format: {str(e)}"}
-        if not isinstance(cookies, list) or not all(isinstance(cookie, dict) and "name" in cookie and "value" in cookie for cookie in cookies):
-            return {"error": "Invalid cookies format"}
-        cookies_dict = {cookie["name"]: cookie["value"] for cookie in cookies}
-        return_only_cookies = data.get("returnOnlyCookies", "false").lower() == "true"
+        if len(parsed_actions) > 10:
+            return {"error": "Too many actions"}
+        try:
+            cookies = normalizeCookies(cookies, url)
+        except ValueError as e:
+            return {"error": f"Invalid cookies format: {str(e)}"}
+        try:
+            headers = normalizeHeaders(data.get("headers") or {})
+        except ValueError as e:
+            return {"error": f"Invalid headers format: {str(e)}"}
+        # A named jar is loaded before the solve and gets its cookies afterwards
+        cookie_jar = data.get("cookieJar")
+        if cookie_jar is not None:
+            if not validJarName(cookie_jar):
+                return {"error": "Invalid cookieJar name"}
+            cookies = mergeCookies(await loadCookieJar(db, result.owner.id, cookie_jar), cookies)
+        url_cookies = cookiesForUrl(cookies, url)
+        try:
+            fields = parseFields(data.get("fields"))
+        except Exception as e:
+            return {"error": f"Invalid fields format: {str(e)}"}
+        # returnOnlyCookies is kept as a shorthand for fields=["cookies"]
+        if isTruthy(data.get("returnOnlyCookies", "false")):
+            fields = ["cookies"]
+        extract_fields = None
+        if data.get("extract") is not None:
+            try:
+                extract_fields = parseExtractSpec(data.get("extract"))
+            except Exception as e:
+                return {"error": f"Invalid extract format: {str(e)}"}
+        capture_options = None
+        if data.get("capture"):
+            try:
+                capture_options = parseCaptureSpec(data.get("capture"))
+            except Exception as e:
+                return {"error": f"Invalid capture format: {str(e)}"}
+        # When extracting, the full page source is only fetched on request
+        include_body = isTruthy(data.get("includeBody", extract_fields is None))
         proxy = data.get("proxy")
         if proxy and not verifyStringIsProxy(proxy):
             return {"error": "Invalid proxy format"}
-        browser = None
-        sess = None
-        if session_id is not None:
-            print(f"Using session {session_id} for user {result.owner.id}")
-            sess = await getSession(session_id)
-            
-            if sess is None:
-                return {"error": "Session not found"}
-            browser = sess["browser"]
+        # Several proxies let the domain profile pick the one that works best for the site
+        proxies = data.get("proxies") or ([proxy] if proxy else [])
+        if not isinstance(proxies, list) or not all(isinstance(p, str) and verifyStringIsProxy(p) for p in proxies):
+            return {"error": "Invalid proxies format"}
+        engine = data.get("engine", os.getenv("DEFAULT_FETCH_ENGINE", "browser"))
+        if engine not in FETCH_ENGINES:
+            return {"error": f"Unknown engine {engine}"}
+        if engine != "browser" and (parsed_actions or extract_fields or capture_options or session_id):
+            if engine == "http":
+                return {"error": "actions, extract, capture and session require the browser engine"}
+            engine = "browser"
+        try:
+            cache_max_age = int(data.get("cacheMaxAge", 0))
+        except (TypeError, ValueError):
+            return {"error": "cacheMaxAge must be an integer"}
+        if cache_max_age < 0:
+            return {"error": "cacheMaxAge must not be negative"}
+        deadline = Deadline(max_timeout, submitted_at, cancel_event)
+        await loadQuota(db, result.owner.id)
+        if isTruthy(data.get("adaptive", os.getenv("ADAPTIVE_PROFILES", "true"))):
+            await loadProfile(db, url)
+            # A session's browser is already bound to its proxy
+            plan = domainProfiles.plan(url, engine, [] if session_id else proxies)
+            logger.debug("Solve plan for %s: %s", url, plan.to_dict())
         else:
-            browser = await NewDriver()
-            if proxy:
-                browser.proxy = proxy
-        last_document = None
-        def receive_handler(event: mycdp.network.ResponseReceived):
-            nonlocal last_document
-            print(f"Document URL: {event.response.url}, {event.response.status} {event.type_}")
-            if event.type_ == mycdp.network.ResourceType.DOCUMENT:
-                last_document = event
-                print("Document loaded")
-        browser.uc_activate_cdp_mode("about:blank")
-        browser.cdp.add_handler(mycdp.network.ResponseReceived, receive_handler)
-        print("Waiting for page to load")
-        browser.cdp.open(url)
-        browser.sleep(6)
-        # parsed_actions
-        if len(parsed_actions) > 10:
-            return {"error": "Too many actions"}
+            plan = SolvePlan(engine, proxies[0] if proxies else None, DEFAULT_SETTLE_SECONDS, DEFAULT_SETTLE_SECONDS, "disabled")
+        if session_id:
+            plan.proxy = proxy
+        async def solve():
+            # Fair share across tenants first, then the per-domain rate limits
+            async with fairScheduler.slot(result.owner.id, ip, deadline), domainThrottle.slot(url, plan.proxy, deadline):
+                if on_start is not None:
+                    # Until here the task was only waiting for its turn
+                    on_start()
+                escalation_reason = None
+                if plan.engine != "browser":
+                    http_result, escalation_reason = await solveWithHttp(
+                        url=url,
+                        proxy=plan.proxy,
+                        cookies=url_cookies,
+                        headers=headers,
+                        deadline=deadline,
+                        include_body=include_body,
+                        origin=result,
+                        db=db,
+                        escalate=plan.engine == "auto",
+                    )
+                    if http_result is not None:
+                        return http_result
+                browser_result = await solveRequest(
+                    url=url,
+                    session_id=session_id,
+                    chrome_session=chrome_session,
+                    proxy=plan.proxy,
+                    deadline=deadline,
+                    plan=plan,
+                    cookies=cookies,
+                    request_headers=headers,
+                    parsed_actions=parsed_actions,
+                    extract_fields=extract_fields,
+                    capture_options=capture_options,
+                    include_body=include_body,
+                    origin=result,
+                    db=db,
+                )
+                if escalation_reason and "solution" in browser_result:
+                    browser_result["solution"]["escalationReason"] = escalation_reason
+                return browser_result
+        # Session-bound requests depend on browser state and are never shared
+        if cache_max_age > 0 and session_id is None:
+            key = cacheKey(url, {
+                "cookies": sorted(cookies, key=lambda cookie: cookie["name"]),
+                "headers": headers,
+                "cookieJar": cookie_jar,
+                "actions": actions,
+                "proxy": proxy,
+                "proxies": data.get("proxies"),
+                "extract": data.get("extract"),
+                "includeBody": include_body,
+                "engine": engine,
+                "capture": data.get("capture"),
+            })
+            solving = resultCache.getOrSolve(key, cache_max_age, solve, deadline, on_start)
+        else:
+            solving = solve()
+        try:
+            solved = await solving
+        except DeadlineExceeded as e:
+            # Deadline hit before a browser was attached, there is no partial data
+            return await deadlineResult(e, None, url, None, [], time.time())
+        except TaskCancelled as e:
+            solved = cancelledResult(e, time.time())
+        except QuotaExceeded as e:
+            return {"error": str(e), "retryAfter": round(e.retry_after, 1)}
+        if solved.get("status") == "cancelled":
+            # Kept in the history like a finished request, with the reason as its response
+            await logRequest(db, result, chrome_session, url, solved["message"], CANCELLED_STATUS_CODE)
+            return solved
+        if solved.get("status") != "ok":
+            return solved
+        # Here rather than in the solvers so cache hits and coalesced requests fill the caller's jar too
+        if cookie_jar is not None and solved["solution"].get("cookies"):
+            await saveJarCookies(db, result.owner.id, cookie_jar, solved["solution"]["cookies"], url)
+        # The solution may be shared through the cache, projection makes a copy per caller
+        return dict(solved, solution=projectSolution(solved["solution"], fields))
+
+
+async def solveRequest(
+    url: str,
+    session_id: Optional[str],
+    chrome_session: Optional[ChromeSession],
+    proxy: Optional[str],
+    deadline: Deadline,
+    plan: SolvePlan,
+    cookies: List[Dict[str, Any]],
+    request_headers: Dict[str, str],
+    parsed_actions: List[BrowserAction],
+    extract_fields: Optional[Dict[str, ExtractField]],
+    capture_options: Optional[CaptureOptions],
+    include_body: bool,
+    origin: AllowedOrigin,
+    db: AsyncSession,
+) -> Dict[str, Any]:
+    start = time.time()
+    response_values = []
+    browser = None
+    sess = None
+    if session_id is not None:
+        logger.info("Using session %s for user %s", session_id, origin.owner.id)
+        sess = await getSession(session_id)
+
+        if sess is None:
+            return {"error": "Session not found"}
+        # Wait for a free tab of the session, requests never share one
+        try:
+            browser = await sess["queue"].acquire(deadline)
+        except (SessionBusy, SessionClosed) as e:
+            return {"error": str(e)}
+    else:
+        browser = await NewDriver(proxy)
+    last_document = None
+    challenged, clearance_seconds = False, None
+    def receive_handler(event):
+        nonlocal last_document
+        logger.debug("Response %s %s %s", event.response.status, event.type_, event.response.url)
+        if event.type_ == browser.network.ResourceType.DOCUMENT:
+            last_document = event
+    capture = None
+    recorder = None
+    try:
+        await browser.activate()
+        browser.add_handler(browser.network.ResponseReceived, receive_handler)
+        if capture_options:
+            capture = NetworkCapture(browser.network, capture_options)
+            capture.attach(browser)
+        if RECORD_DIR:
+            # Record mode: the whole solve goes into an archive for offline replay
+            recorder = newRecorder(browser.network)
+            recorder.attach(browser)
+        # Injected before navigation so the first request already carries them
+        if cookies:
+            await browser.set_cookies(cookies)
+        if request_headers:
+            await browser.set_extra_headers(request_headers)
+        logger.info("Opening %s", url)
+        await browser.open(url)
+        challenged, clearance_seconds = await waitForClearance(browser, deadline, plan)
         for action in parsed_actions:
+            deadline.check(f"action {action.action}")
             match action.action:
                 case "reload":
-                    print("Reloading page")
-                    browser.cdp.reload()
+                    logger.debug("Reloading page")
+                    await browser.reload()
                 case "wait":
-                    print(f"Waiting for {action.value} seconds")
+                    logger.debug("Waiting for %s seconds", action.value)
                     waitTime = int(action.value)
-                    
+
                     if waitTime > 60:
                         return {"error": "Wait time too long"}
                     if waitTime < 0:
                         return {"error": "Wait time cannot be negative"}
-                    browser.sleep(waitTime)
+                    await deadline.sleep(waitTime, f"action {action.action}")
                 case "script":
-                    print("Executing script")
+                    logger.debug("Executing script")
                     if not action.value:
                         return {"error": "Script is required"}
                     if len(action.value) > 10000:
                         return {"error": "Script too long"}
                     try:
-                        f =  browser.cdp.evaluate(action.value)
+                        f = await browser.evaluate(action.value)
                         response_values.append(f)
                     except Exception as e:
                         return {"error": f"Script execution failed: {str(e)}"}
                 case "type":
-                    print("Typing")
+                    logger.debug("Typing into %s", action.selector)
                     if not action.value:
                         return {"error": "Value is required"}
                     if len(action.value) > 10000:
@@ -165,109 +369,266 @@ async def flaresolverRoute(data : Dict[str, Any], ip: str, db: AsyncSession) ->
                     if len(action.selector) > 100:
                         return {"error": "Selector too long (100 max)"}
                     try:
-                        browser.cdp.type(action.value, action.selector)
+                        await browser.type(action.selector, action.value)
                     except Exception as e:
                         return {"error": f"Typing failed: {str(e)}"} 
                 case "waitForSelector":
-                    print("Waiting for selector")
+                    logger.debug("Waiting for selector %s", action.selector)
                     if not action.selector:
                         return {"error": "Selector is required"}
                     if len(action.selector) > 100:
                         return {"error": "Selector too long (100 max)"}
                     try:
-                        browser.cdp.wait_for_selector(action.selector, timeout=max_timeout * 1000)
+                        await browser.wait_for_selector(action.selector, timeout=deadline.remaining())
                     except Exception as e:
+                        deadline.check(f"action {action.action}")
                         return {"error": f"Waiting for selector failed: {str(e)}"}
                 case _:
                     return {"error": f"Unknown action {action.action}"}
-        cookies = browser.cdp.get_all_cookies()
-        headers = last_document.response.headers if last_document else {}
-        response = browser.cdp.get_page_source()
+        deadline.check("actions")
+        if capture:
+            await capture.fetch_bodies(browser, deadline)
+        cookies = await browser.get_cookies()
+        response_headers = last_document.response.headers if last_document else {}
+        extracted = None
+        extract_errors = {}
+        if extract_fields:
+            try:
+                extracted, extract_errors = parseExtractResult(await browser.evaluate(buildExtractScript(extract_fields)))
+            except Exception as e:
+                return {"error": f"Extraction failed: {str(e)}"}
+        response = await browser.get_content() if include_body else None
         status = last_document.response.status if last_document else 0
-        ua = browser.get_user_agent()
+        ua = await browser.get_user_agent()
         screen_path = f'{uuid4().hex}.png'
-        screenshot = browser.cdp.save_screenshot(screen_path, os.getenv('SCREENSHOT_DIR'))
-        print(f"Screenshot saved to {screenshot}")
+        screenshot = await browser.save_screenshot(screen_path, os.getenv('SCREENSHOT_DIR'))
+        logger.debug("Screenshot saved to %s", screenshot)
+        if recorder:
+            await saveRecording(recorder, browser, deadline, url, cookies, type(browser).__name__)
+    except DeadlineExceeded as e:
+        timeout_result = await deadlineResult(e, browser, url, last_document, response_values, start)
+        recordOutcome(url, "browser", proxy, False, challenged, clearance_seconds, timeout_result["solution"].get("cookies"))
+        return timeout_result
+    except TaskCancelled as e:
+        if session_id is not None:
+            # Hand the session back idle rather than halfway through someone else's page
+            try:
+                await browser.open("about:blank")
+            except Exception as reset_error:
+                logger.warning("Could not reset session %s: %s", session_id, reset_error)
+        return cancelledResult(e, start)
+    finally:
         if session_id is None:
-            browser.quit()
-        
-        # After successful request, log it to the database
+            await browser.quit()
+        else:
+            # Handlers and headers belong to this request, the next one on the tab starts clean
+            browser.remove_handler(browser.network.ResponseReceived, receive_handler)
+            if capture:
+                capture.detach(browser)
+            if recorder:
+                recorder.detach(browser)
+            if request_headers:
+                try:
+                    await browser.set_extra_headers({})
+                except Exception as reset_error:
+                    logger.warning("Could not reset headers of session %s: %s", session_id, reset_error)
+            sess["queue"].release(browser)
+
+    # After successful request, log it to the database
+    # Store the structured result instead of the page when the body was not requested
+    stored_response = response if response is not None else json.dumps(extracted)
+    await logRequest(db, origin, chrome_session, url, stored_response, status, screen_path)
+    # A challenge still up after the wait budget is a failed solve, whatever the status
+    recordOutcome(url, "browser", proxy, not challenged or clearance_seconds is not None, challenged, clearance_seconds, cookies)
+
+    solution = {
+        "url" : url,
+        "status": status,
+        "headers": response_headers,
+        "response": response,
+        "cookies": cookies,
+        "userAgent": ua,
+        "response_values": response_values,
+        "engine": "browser",
+    }
+    if capture:
+        solution["network"] = capture.export()
+    if extract_fields:
+        solution["extracted"] = extracted
+        if extract_errors:
+            solution["extractErrors"] = extract_errors
+        if response is None:
+            del solution["response"]
+    return {
+        "solution": solution,
+        "status": "ok",
+        "message": "",
+        "startTimestamp": start,
+        "endTimestamp": time.time(),
+        "version": "1.0.0",
+    }
+
+
+async def solveWithHttp(
+    url: str,
+    proxy: Optional[str],
+    cookies: List[Dict[str, Any]],
+    headers: Dict[str, str],
+    deadline: Deadline,
+    include_body: bool,
+    origin: AllowedOrigin,
+    db: AsyncSession,
+    escalate: bool,
+):
+    """Serve the request with a plain HTTP client.
+
+    Returns (result, None) when the HTTP response is good enough, or
+    (None, reason) when `escalate` is set and the page needs a browser.
+    """
+    start = time.time()
+    deadline.check("http fetch")
+    try:
+        solution = await httpFetch(url, proxy, cookies, deadline.remaining(), headers)
+    except HttpFetchError as e:
+        recordOutcome(url, "http", proxy, False)
+        if escalate:
+            return None, f"http error: {type(e.__cause__ or e).__name__}"
+        return {"error": f"HTTP fetch failed: {str(e)}"}, None
+    challenge = solution.pop("challenge")
+    recordOutcome(url, "http", proxy, challenge is None, challenge is not None, None, solution["cookies"])
+    if challenge and escalate:
+        logger.info("Escalating %s to the browser: %s", url, challenge)
+        return None, challenge
+    await logRequest(db, origin, None, url, solution["response"], solution["status"])
+    solution["engine"] = "http"
+    if challenge:
+        solution["challenge"] = challenge
+    if not include_body:
+        del solution["response"]
+    return {
+        "solution": solution,
+        "status": "ok",
+        "message": "",
+        "startTimestamp": start,
+        "endTimestamp": time.time(),
+        "version": "1.0.0",
+    }, None
+
+
+async def waitForClearance(browser, deadline: Deadline, plan: SolvePlan):
+    """Let the page settle, then wait out any challenge on it within the plan's budget.
+
+    Returns (challenged, seconds to clearance), the seconds being None when
+    no challenge was seen or it was still up when the budget ran out.
+    """
+    opened_at = time.monotonic()
+    await deadline.sleep(plan.settle, "navigation")
+    challenged = False
+    while True:
+        content = await browser.get_content()
+        if not INTERSTITIAL_MARKERS.search(content[:200000]):
+            if not challenged:
+                return False, None
+            cleared_after = time.monotonic() - opened_at
+            # The cleared page is still loading its own resources
+            await deadline.sleep(CLEARANCE_POLL_INTERVAL, "navigation")
+            return True, cleared_after
+        challenged = True
+        if time.monotonic() - opened_at >= plan.wait_budget:
+            logger.info("Challenge still up after %gs", plan.wait_budget)
+            return True, None
+        await deadline.sleep(CLEARANCE_POLL_INTERVAL, "challenge")
+
+
+async def saveJarCookies(db: AsyncSession, user_id: int, cookie_jar: str, cookies: List[Dict[str, Any]], url: str):
+    try:
+        await storeCookieJar(db, user_id, cookie_jar, cookies, url=url)
+    except Exception as e:
+        # The solve itself succeeded, only later reuse is lost
+        logger.warning("Could not store cookies in jar %s: %s", cookie_jar, e)
+
+
+async def logRequest(db: AsyncSession, origin: AllowedOrigin, chrome_session: Optional[ChromeSession], url: str, stored_response: str, status: int, screen_path: Optional[str] = None):
+    try:
+        # Create a new Request object
+        request_record = Request(
+            method="GET",
+            url=url,
+            string_response=base64.b64encode(stored_response.encode()).decode(),
+            user_id=origin.owner.id,
+            request_origin_id=origin.id,
+            screenShotName=screen_path,
+            status_code=status,
+            created_at=datetime.datetime.utcnow(),
+            updated_at=datetime.datetime.utcnow(),
+        )
+
+        # Associate with chrome session if one was used
+        if chrome_session:
+            request_record.chrome_session_id = chrome_session.id
+
+        # Add to database and commit
+        db.add(request_record)
+        await db.commit()
+        logger.info("Request logged to database: %s", url)
         try:
-            # Create a new Request object
-            request_record = Request(
-                method="GET",
-                url=url,
-                string_response=base64.b64encode(response.encode()).decode(),
-                user_id=result.owner.id,
-                request_origin_id=result.id,
-                screenShotName=screen_path,
-                status_code=status,
-                created_at=datetime.datetime.utcnow(),
-                updated_at=datetime.datetime.utcnow(),
-            )
-            print("request origin id", result.id)
-            
-            # Associate with chrome session if one was used
-            if chrome_session:
-                request_record.chrome_session_id = chrome_session.id
-            
-            # Add to database and commit
-            db.add(request_record)
+            await indexRequest(db, request_record.id, origin.owner.id, url, stored_response)
+        except Exception as index_error:
+            logger.warning("Could not index request %s for search: %s", request_record.id, index_error)
+
+        # Rename the screenshot file to use the request ID - with error handling
+        if screen_path is None:
+            return
+        try:
+            new_screenshot_name = f"{request_record.id}.png"
+            old_screenshot_path = os.path.join(os.getenv('SCREENSHOT_DIR'), screen_path)
+            new_screenshot_path = os.path.join(os.getenv('SCREENSHOT_DIR'), new_screenshot_name)
+
+            os.rename(old_screenshot_path, new_screenshot_path)
+
+            # Update the request record with the new screenshot name
+            request_record.screenShotName = new_screenshot_name
             await db.commit()
-            
-            # Rename the screenshot file to use the request ID - with error handling
-            try:
-                new_screenshot_name = f"{request_record.id}.png"
-                old_screenshot_path = os.path.join(os.getenv('SCREENSHOT_DIR'), screen_path)
-                new_screenshot_path = os.path.join(os.getenv('SCREENSHOT_DIR'), new_screenshot_name)
-                
-                print(f"Renaming screenshot from: {old_screenshot_path}")
-                print(f"Renaming screenshot to: {new_screenshot_path}")
-                print(f"File exists (old path): {os.path.exists(old_screenshot_path)}")
-                
-                os.rename(old_screenshot_path, new_screenshot_path)
-                
-                # Update the request record with the new screenshot name
-                request_record.screenShotName = new_screenshot_name
-                await db.commit()
-                print(f"Screenshot successfully renamed to {new_screenshot_name}")
-            except Exception as rename_error:
-                print(f"Error renaming screenshot: {rename_error}")
-                # Keep the original name if rename fails
-                print(f"Keeping original screenshot name: {screen_path}")
+            logger.debug("Screenshot renamed to %s", new_screenshot_name)
+        except Exception as rename_error:
+            # Keep the original name if rename fails
+            logger.warning("Error renaming screenshot, keeping %s: %s", screen_path, rename_error)
+    except Exception:
+        logger.exception("Failed to log request to database")
+        # Continue execution even if logging fails
 
-            print(f"Request logged to database: {url}")
+
+async def deadlineResult(error: DeadlineExceeded, browser, url: str, last_document, response_values: list, start: float) -> Dict[str, Any]:
+    """Timeout error carrying whatever the browser had gathered so far."""
+    partial = {
+        "url": url,
+        "status": last_document.response.status if last_document else 0,
+        "headers": last_document.response.headers if last_document else {},
+        "response_values": response_values,
+    }
+    if browser is not None:
+        try:
+            partial["cookies"] = await browser.get_cookies()
+            partial["response"] = await browser.get_content()
         except Exception as e:
-            print(f"Failed to log request to database: {e}")
-            # Continue execution even if logging fails
-        
-        if return_only_cookies:
-            return {
-                "solution": {
-                    "cookies": cookies,
-                },
-                "status": "ok",
-                "message": "",
-                "startTimestamp": start,
-                "endTimestamp": time.time(),
-                "version": "1.0.0",
-            }
-        
-        return {
-            "solution": {
-                "url" : url,
-                "status": status,
-                "headers": headers,
-                "response": response,
-                "cookies": cookies,
-                "userAgent": ua,
-                "response_values": response_values,
-            },
-            "status": "ok",
-            "message": "",
-            "startTimestamp": start,
-            "endTimestamp": time.time(),
-            "version": "1.0.0",
-        }
+            logger.warning("Could not collect partial data: %s", e)
+    return {
+        "error": str(error),
+        "solution": partial,
+        "status": "timeout",
+        "message": str(error),
+        "startTimestamp": start,
+        "endTimestamp": time.time(),
+        "version": "1.0.0",
+    }
 
 
+def cancelledResult(error: TaskCancelled, start: float) -> Dict[str, Any]:
+    return {
+        "error": str(error),
+        "status": "cancelled",
+        "message": str(error),
+        "startTimestamp": start,
+        "endTimestamp": time.time(),
+        "version": "1.0.0",
+    }
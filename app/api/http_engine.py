@@ -0,0 +1,121 @@
+import os
+import re
+from http.cookiejar import Cookie
+from typing import Any, Dict, List, Mapping, Optional
+from urllib.parse import urlsplit
+from app.util import proxyServer
+
+FETCH_ENGINES = ("browser", "http", "auto")
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+CHALLENGE_STATUS_CODES = (403, 429, 503)
+# Markers of Cloudflare and similar interstitials, matched case-insensitively in the body.
+# Not /cdn-cgi/challenge-platform/: Cloudflare injects that script into cleared pages too
+CHALLENGE_MARKERS = re.compile(
+    r"cf-chl|cf_chl_opt|__cf_chl|<title>\s*just a moment\.\.\.|attention required! \| cloudflare"
+    r"|checking your browser|ddos-guard|captcha-delivery|_incapsula_resource|px-captcha",
+    re.IGNORECASE,
+)
+# Only found on the interstitial itself, never on the page it lets through. Used to
+# poll a browser page until the challenge clears, where scripts and cookies the
+# vendors inject into cleared pages must not count
+INTERSTITIAL_MARKERS = re.compile(
+    r"cf_chl_opt|<title>\s*(?:just a moment\.\.\.|attention required! \| cloudflare|ddos-guard)"
+    r"|captcha-delivery|px-captcha",
+    re.IGNORECASE,
+)
+# An HTML page shorter than this is almost certainly a shell waiting for a script
+MIN_HTML_LENGTH = 512
+
+
+class HttpFetchError(Exception):
+    """Transport-level failure of the HTTP engine (DNS, TLS, timeout, proxy)."""
+
+
+def challengeReason(status: int, headers: Mapping[str, str], body: str) -> Optional[str]:
+    """Why an HTTP response needs a real browser, or None when it can be served as is."""
+    if headers.get("cf-mitigated") == "challenge":
+        return "cf-mitigated header"
+    marker = CHALLENGE_MARKERS.search(body[:200000])
+    if marker:
+        return f"challenge marker {marker.group(0)!r}"
+    if status in CHALLENGE_STATUS_CODES:
+        return f"status {status}"
+    if "html" in headers.get("content-type", "") and len(body.strip()) < MIN_HTML_LENGTH:
+        return "missing content"
+    return None
+
+
+def requestCookie(cookie: Dict[str, Any], host: str) -> Cookie:
+    """A CDP-shaped cookie for the client's jar, keeping its domain, path and flags.
+
+    httpx's Cookies.set() would scope it to no domain and flag it HttpOnly.
+    """
+    domain = cookie.get("domain") or urlsplit(cookie.get("url", "")).hostname or host
+    expires = cookie.get("expires")
+    expires = int(expires) if expires is not None and expires > 0 else None
+    return Cookie(
+        version=0, name=cookie["name"], value=cookie["value"], port=None, port_specified=False,
+        # Cookies scoped by url are host-only, like the browser would store them
+        domain=domain, domain_specified=bool(cookie.get("domain")), domain_initial_dot=domain.startswith("."),
+        path=cookie.get("path") or "/", path_specified=True, secure=bool(cookie.get("secure")),
+        expires=expires, discard=expires is None, comment=None, comment_url=None,
+        rest={"HttpOnly": None} if cookie.get("httpOnly") else {},
+    )
+
+
+def cookieToJson(cookie: Cookie, host: str) -> Dict[str, Any]:
+    # Same shape as the CDP cookies returned by the browser engines
+    return {
+        "name": cookie.name,
+        "value": cookie.value,
+        # Host-only cookies may have no domain of their own
+        "domain": cookie.domain or host,
+        "path": cookie.path,
+        "expires": cookie.expires if cookie.expires is not None else -1,
+        "secure": cookie.secure,
+        # Attribute names keep the server's spelling, e.g. "httponly"
+        "httpOnly": any(name.lower() == "httponly" for name in cookie._rest),
+    }
+
+
+async def httpFetch(url: str, proxy: Optional[str], cookies: List[Dict[str, Any]], timeout: float, extra_headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """GET `url` over HTTP/2 with browser-like headers.
+
+    A client is created per call because v1 tasks may each run on their own
+    event loop, and httpx clients are bound to the loop that opened them.
+    """
+    # Imported here so startup does not pay for httpx and its HTTP/2 stack
+    import httpx
+    user_agent = os.getenv("HTTP_ENGINE_USER_AGENT", DEFAULT_USER_AGENT)
+    headers = {
+        "User-Agent": user_agent,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-US,en;q=0.9",
+        **(extra_headers or {}),
+    }
+    proxy_url = f"http://{proxyServer(proxy)}" if proxy else None
+    host = urlsplit(url).hostname or ""
+    async with httpx.AsyncClient(http2=True, proxy=proxy_url, follow_redirects=True, timeout=timeout, headers=headers) as client:
+        for cookie in cookies:
+            client.cookies.jar.set_cookie(requestCookie(cookie, host))
+        try:
+            response = await client.get(url)
+        except httpx.HTTPError as e:
+            raise HttpFetchError(str(e) or e.__class__.__name__) from e
+        body = response.text
+        return {
+            "url": url,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "response": body,
+            "cookies": [cookieToJson(cookie, host) for cookie in client.cookies.jar],
+            # The caller's headers may have replaced the default User-Agent
+            "userAgent": response.request.headers.get("User-Agent", user_agent),
+            "response_values": [],
+            "challenge": challengeReason(response.status_code, response.headers, body),
+        }
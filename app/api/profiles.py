@@ -0,0 +1,336 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.models import DomainProfile
+from app.util import proxyServer
+
+logger = logging.getLogger(__name__)
+
+# Weight kept by the history at every new outcome, ~100 requests of memory at 0.99
+PROFILE_DECAY = float(os.getenv("PROFILE_DECAY", 0.99))
+# Outcomes needed before a profile overrides the defaults
+PROFILE_MIN_SAMPLES = int(os.getenv("PROFILE_MIN_SAMPLES", 5))
+# Share of requests that ignore the profile, so a site that changed is noticed
+PROFILE_EXPLORE_RATE = float(os.getenv("PROFILE_EXPLORE_RATE", 0.05))
+# Below this success rate the HTTP engine is skipped for "auto" requests
+PROFILE_HTTP_MIN_SUCCESS = float(os.getenv("PROFILE_HTTP_MIN_SUCCESS", 0.2))
+# Time on the page before the first look for a challenge, for profiled and unknown domains
+PROFILE_SETTLE_SECONDS = float(os.getenv("PROFILE_SETTLE_SECONDS", 1.5))
+DEFAULT_SETTLE_SECONDS = 6.0
+# Longest wait for a challenge to clear
+PROFILE_MAX_WAIT = float(os.getenv("PROFILE_MAX_WAIT", 30))
+# Upper bounds, in seconds, of the time-to-clearance histogram buckets
+CLEARANCE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 60)
+# Cookies that prove a challenge was passed
+CLEARANCE_COOKIES = ("cf_clearance", "datadome", "_px3", "__cf_bm")
+DIRECT = "direct"
+# Outcomes are written to the database in batches this often, not on every request
+PROFILE_FLUSH_INTERVAL = float(os.getenv("PROFILE_FLUSH_INTERVAL", 10))
+
+
+class ProfileStats:
+    """Decayed outcome counters for one domain.
+
+    Every counter is multiplied by PROFILE_DECAY before an outcome is added,
+    so recent requests dominate and a site that changes its protection is
+    picked up without a reset.
+    """
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self.samples = 0.0
+        self.challenges = 0.0
+        self.clearances = 0.0
+        self.failures = 0.0
+        self.clearance_histogram = [0.0] * (len(CLEARANCE_BUCKETS) + 1)
+        # name -> [attempts, successes]
+        self.engines: Dict[str, List[float]] = {}
+        self.proxies: Dict[str, List[float]] = {}
+        self.cookie_lifetime: Optional[float] = None
+        self.updated = 0.0
+
+    def decay(self):
+        self.samples *= PROFILE_DECAY
+        self.challenges *= PROFILE_DECAY
+        self.clearances *= PROFILE_DECAY
+        self.failures *= PROFILE_DECAY
+        self.clearance_histogram = [count * PROFILE_DECAY for count in self.clearance_histogram]
+        for counters in (*self.engines.values(), *self.proxies.values()):
+            counters[0] *= PROFILE_DECAY
+            counters[1] *= PROFILE_DECAY
+
+    def record(self, engine: str, proxy: Optional[str], success: bool, challenged: bool, clearance_seconds: Optional[float], cookie_lifetime: Optional[float]):
+        self.decay()
+        self.samples += 1
+        if challenged:
+            self.challenges += 1
+            if clearance_seconds is not None:
+                self.clearances += 1
+                bucket = next((i for i, bound in enumerate(CLEARANCE_BUCKETS) if clearance_seconds <= bound), len(CLEARANCE_BUCKETS))
+                self.clearance_histogram[bucket] += 1
+        if not success:
+            self.failures += 1
+        for counters in (self.engines.setdefault(engine, [0.0, 0.0]), self.proxies.setdefault(proxyKey(proxy), [0.0, 0.0])):
+            counters[0] += 1
+            counters[1] += 1 if success else 0
+        if cookie_lifetime is not None:
+            self.cookie_lifetime = cookie_lifetime if self.cookie_lifetime is None else 0.8 * self.cookie_lifetime + 0.2 * cookie_lifetime
+        self.updated = time.time()
+
+    def challengeRate(self) -> float:
+        return self.challenges / self.samples if self.samples else 0.0
+
+    def successRate(self, counters: Optional[List[float]]) -> Optional[float]:
+        if not counters or counters[0] < 1:
+            return None
+        return counters[1] / counters[0]
+
+    def clearancePercentile(self, percentile: float) -> Optional[float]:
+        total = sum(self.clearance_histogram)
+        if total < 1:
+            return None
+        running = 0.0
+        for index, count in enumerate(self.clearance_histogram):
+            running += count
+            if running >= total * percentile:
+                return float(CLEARANCE_BUCKETS[index]) if index < len(CLEARANCE_BUCKETS) else PROFILE_MAX_WAIT
+        return PROFILE_MAX_WAIT
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "domain": self.domain,
+            "samples": round(self.samples, 2),
+            "challenge_rate": round(self.challengeRate(), 3),
+            "clearance_rate": round(self.clearances / self.challenges, 3) if self.challenges else None,
+            "failure_rate": round(self.failures / self.samples, 3) if self.samples else 0.0,
+            "clearance_p50": self.clearancePercentile(0.5),
+            "clearance_p90": self.clearancePercentile(0.9),
+            "clearance_histogram": {
+                (f"<={bound}s" if index < len(CLEARANCE_BUCKETS) else f">{CLEARANCE_BUCKETS[-1]}s"): round(count, 2)
+                for index, (bound, count) in enumerate(zip((*CLEARANCE_BUCKETS, None), self.clearance_histogram))
+            },
+            "engines": {name: {"attempts": round(c[0], 2), "success_rate": round(c[1] / c[0], 3)} for name, c in self.engines.items() if c[0] >= 0.01},
+            "proxies": {name: {"attempts": round(c[0], 2), "success_rate": round(c[1] / c[0], 3)} for name, c in self.proxies.items() if c[0] >= 0.01},
+            "cookie_lifetime_seconds": round(self.cookie_lifetime) if self.cookie_lifetime is not None else None,
+            "updated": self.updated,
+        }
+
+
+class SolvePlan:
+    """Engine, proxy and waits chosen for one request."""
+
+    def __init__(self, engine: str, proxy: Optional[str], settle: float, wait_budget: float, reason: str):
+        self.engine = engine
+        self.proxy = proxy
+        self.settle = settle
+        self.wait_budget = wait_budget
+        self.reason = reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"engine": self.engine, "settle": self.settle, "waitBudget": self.wait_budget, "reason": self.reason}
+
+
+def domainOf(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def proxyKey(proxy: Optional[str]) -> str:
+    # Credentials stay out of the stored profile
+    server = proxyServer(proxy)
+    return server.rsplit("@", 1)[-1] if server else DIRECT
+
+
+def clearanceCookieLifetime(cookies: List[Dict[str, Any]]) -> Optional[float]:
+    now = time.time()
+    lifetimes = [
+        cookie["expires"] - now for cookie in cookies or []
+        if cookie.get("name") in CLEARANCE_COOKIES and (cookie.get("expires") or -1) > now
+    ]
+    return max(lifetimes) if lifetimes else None
+
+
+class DomainProfiles:
+    """In-memory domain profiles, loaded from the database on first use.
+
+    Updated from v1 tasks running on their own threads, hence the lock.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[str, ProfileStats] = {}
+        # Domains with outcomes not written to the database yet
+        self.dirty = set()
+        self.lock = threading.Lock()
+
+    def loaded(self, domain: str) -> bool:
+        return domain in self.profiles
+
+    def put(self, stats: ProfileStats):
+        with self.lock:
+            self.profiles.setdefault(stats.domain, stats)
+
+    def get(self, domain: str) -> Optional[ProfileStats]:
+        return self.profiles.get(domain)
+
+    def forget(self, domain: str):
+        with self.lock:
+            self.profiles.pop(domain, None)
+            self.dirty.discard(domain)
+
+    def plan(self, url: str, engine: str, proxies: List[Optional[str]]) -> SolvePlan:
+        """Pick the engine, proxy and waits for `url` from what its domain has done so far.
+
+        Only an "auto" engine and a list of several proxies leave a choice,
+        an explicit engine or single proxy from the caller always wins.
+        """
+        with self.lock:
+            stats = self.profiles.get(domainOf(url))
+            if stats is None or stats.samples < PROFILE_MIN_SAMPLES or random.random() < PROFILE_EXPLORE_RATE:
+                return SolvePlan(engine, random.choice(proxies) if proxies else None, DEFAULT_SETTLE_SECONDS, PROFILE_MAX_WAIT, "default")
+            reasons = []
+            if engine == "auto":
+                http_success = stats.successRate(stats.engines.get("http"))
+                if http_success is not None and http_success < PROFILE_HTTP_MIN_SUCCESS:
+                    engine = "browser"
+                    reasons.append(f"http succeeds {http_success:.0%}")
+            proxy = None
+            if proxies:
+                # Laplace smoothing gives proxies without history an even chance
+                scores = {p: (c[1] + 1) / (c[0] + 2) for p, c in ((p, stats.proxies.get(proxyKey(p), [0.0, 0.0])) for p in proxies)}
+                best = max(scores.values())
+                proxy = random.choice([p for p, score in scores.items() if score == best])
+                if len(proxies) > 1:
+                    reasons.append(f"proxy {proxyKey(proxy)} scores {best:.2f}")
+            wait_budget = PROFILE_MAX_WAIT
+            p90 = stats.clearancePercentile(0.9)
+            if p90 is not None and stats.clearances >= PROFILE_MIN_SAMPLES:
+                # Challenges still up well past the usual clearance time rarely clear at all
+                wait_budget = min(PROFILE_MAX_WAIT, max(p90 * 1.5, PROFILE_SETTLE_SECONDS + 2))
+                reasons.append(f"clearance p90 {p90:g}s")
+            return SolvePlan(engine, proxy, PROFILE_SETTLE_SECONDS, wait_budget, ", ".join(reasons) or "profile")
+
+    def record(self, url: str, engine: str, proxy: Optional[str], success: bool, challenged: bool = False, clearance_seconds: Optional[float] = None, cookies: Optional[List[Dict[str, Any]]] = None) -> ProfileStats:
+        domain = domainOf(url)
+        with self.lock:
+            stats = self.profiles.setdefault(domain, ProfileStats(domain))
+            stats.record(engine, proxy, success, challenged, clearance_seconds, clearanceCookieLifetime(cookies))
+            self.dirty.add(domain)
+            return stats
+
+    def takeDirty(self) -> Dict[str, str]:
+        """domain -> stored JSON of every profile changed since the last call."""
+        with self.lock:
+            payloads = {
+                domain: json.dumps({field: getattr(self.profiles[domain], field) for field in STORED_FIELDS})
+                for domain in self.dirty if domain in self.profiles
+            }
+            self.dirty.clear()
+            return payloads
+
+    def markDirty(self, domains):
+        with self.lock:
+            self.dirty.update(domain for domain in domains if domain in self.profiles)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [stats.to_dict() for stats in sorted(self.profiles.values(), key=lambda s: -s.samples)]
+
+
+STORED_FIELDS = ("samples", "challenges", "clearances", "failures", "clearance_histogram", "engines", "proxies", "cookie_lifetime", "updated")
+
+
+def statsFromRow(row: DomainProfile) -> ProfileStats:
+    stats = ProfileStats(row.domain)
+    for field, value in json.loads(row.stats or "{}").items():
+        if field in STORED_FIELDS:
+            setattr(stats, field, value)
+    if len(stats.clearance_histogram) != len(CLEARANCE_BUCKETS) + 1:
+        # Buckets changed since the row was written, start the histogram over
+        stats.clearance_histogram = [0.0] * (len(CLEARANCE_BUCKETS) + 1)
+    return stats
+
+
+async def loadDomain(db: AsyncSession, domain: str) -> Optional[ProfileStats]:
+    """Cache the domain's profile in memory the first time it is requested."""
+    if not domainProfiles.loaded(domain):
+        row = (await db.execute(select(DomainProfile).where(DomainProfile.domain == domain))).scalar_one_or_none()
+        domainProfiles.put(statsFromRow(row) if row is not None else ProfileStats(domain))
+    return domainProfiles.get(domain)
+
+
+async def loadProfile(db: AsyncSession, url: str):
+    await loadDomain(db, domainOf(url))
+
+
+async def listProfiles(db: AsyncSession) -> List[Dict[str, Any]]:
+    """Every stored profile, with the in-memory state of the loaded ones."""
+    rows = (await db.execute(select(DomainProfile))).scalars().all()
+    for row in rows:
+        if not domainProfiles.loaded(row.domain):
+            domainProfiles.put(statsFromRow(row))
+    return [stats for stats in domainProfiles.stats() if stats["samples"] > 0]
+
+
+async def saveProfiles(db: AsyncSession, payloads: Dict[str, str]):
+    rows = (await db.execute(select(DomainProfile).where(DomainProfile.domain.in_(payloads)))).scalars().all()
+    existing = {row.domain: row for row in rows}
+    for domain, payload in payloads.items():
+        row = existing.get(domain)
+        if row is None:
+            row = DomainProfile(domain=domain)
+            db.add(row)
+        row.stats = payload
+    await db.commit()
+
+
+async def flushProfiles() -> int:
+    """Write every profile changed since the last flush, in one transaction."""
+    payloads = domainProfiles.takeDirty()
+    if not payloads:
+        return 0
+    try:
+        async with AsyncSessionLocal() as db:
+            await saveProfiles(db, payloads)
+    except Exception:
+        # Kept in memory, written with the next flush
+        domainProfiles.markDirty(payloads)
+        raise
+    return len(payloads)
+
+
+async def profileFlushLoop():
+    """Background task started by the application lifespan, which flushes once more on shutdown."""
+    while True:
+        await asyncio.sleep(PROFILE_FLUSH_INTERVAL)
+        try:
+            await flushProfiles()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Could not save domain profiles: %s", e)
+
+
+def recordOutcome(url: str, engine: str, proxy: Optional[str], success: bool, challenged: bool = False, clearance_seconds: Optional[float] = None, cookies: Optional[List[Dict[str, Any]]] = None):
+    # Only the in-memory profile, profileFlushLoop persists it off the request path
+    domainProfiles.record(url, engine, proxy, success, challenged, clearance_seconds, cookies)
+
+
+async def resetProfile(db: AsyncSession, domain: str) -> bool:
+    domainProfiles.forget(domain)
+    row = (await db.execute(select(DomainProfile).where(DomainProfile.domain == domain))).scalar_one_or_none()
+    if row is None:
+        return False
+    await db.delete(row)
+    await db.commit()
+    return True
+
+
+domainProfiles = DomainProfiles()
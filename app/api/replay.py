@@ -0,0 +1,169 @@
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from uuid import uuid4
+from app.api.capture import MAX_CAPTURE_BODY_SIZE, MAX_CAPTURE_ENTRIES, NetworkCapture
+from app.schemas import CaptureOptions
+
+logger = logging.getLogger(__name__)
+
+# When set, every browser solve is recorded into an archive in this directory
+RECORD_DIR = os.getenv("RECORD_DIR") or None
+# Every resource with its body, the archive must be enough to serve the page offline
+RECORD_OPTIONS = CaptureOptions(bodies=True, maxEntries=MAX_CAPTURE_ENTRIES, maxBodySize=MAX_CAPTURE_BODY_SIZE, format="har")
+# Recomputed by Chrome from the replayed body, sending the recorded ones corrupts it
+DROPPED_REPLAY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def newRecorder(network) -> NetworkCapture:
+    return NetworkCapture(network, RECORD_OPTIONS)
+
+
+def archiveName(url: str) -> str:
+    domain = (urlsplit(url).hostname or "page").lower()
+    return f"{domain}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid4().hex[:8]}.har.gz"
+
+
+def buildArchive(recorder: NetworkCapture, url: str, cookies: List[Dict[str, Any]], engine: str) -> Dict[str, Any]:
+    """HAR 1.2 log of a solve, with the page URL and final cookies as extra fields."""
+    log = recorder.to_har()
+    log["_recording"] = {
+        "url": url,
+        "engine": engine,
+        "recordedAt": time.time(),
+        "dropped": recorder.dropped,
+        "cookies": cookies,
+    }
+    return {"log": log}
+
+
+def writeArchive(path: str, archive: Dict[str, Any]):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        json.dump(archive, f)
+
+
+def readArchive(path: str) -> Dict[str, Any]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def saveRecording(recorder: NetworkCapture, page, deadline, url: str, cookies: List[Dict[str, Any]], engine: str, directory: Optional[str] = None) -> Optional[str]:
+    """Fetch the recorded bodies from the page and write the archive, returns its path."""
+    directory = directory or RECORD_DIR
+    try:
+        await recorder.fetch_bodies(page, deadline)
+        path = os.path.join(directory, archiveName(url))
+        await asyncio.to_thread(writeArchive, path, buildArchive(recorder, url, cookies, engine))
+        logger.info("Recorded %s into %s", url, path)
+        return path
+    except Exception as e:
+        # Recording is a diagnostic, it never fails the solve
+        logger.warning("Could not record %s: %s", url, e)
+        return None
+
+
+class ReplayEntry:
+    def __init__(self, har_entry: Dict[str, Any]):
+        request, response = har_entry["request"], har_entry["response"]
+        self.method = request["method"]
+        self.url = request["url"]
+        self.status = response.get("status") or 0
+        self.headers = [
+            (header["name"], header["value"]) for header in response.get("headers", [])
+            if header["name"].lower() not in DROPPED_REPLAY_HEADERS
+        ]
+        content = response.get("content", {})
+        text = content.get("text")
+        if text is None:
+            self.body = b""
+        elif content.get("encoding") == "base64":
+            self.body = base64.b64decode(text)
+        else:
+            self.body = text.encode("utf-8")
+        # Milliseconds from request to the last byte when it was recorded
+        self.time = max(float(har_entry.get("time") or 0), 0.0)
+
+
+class Replayer:
+    """Serves a recorded archive to a page through CDP Fetch interception.
+
+    Every request the page makes is paused and answered from the archive
+    after the delay it originally took, scaled by `speed` (0 answers at
+    once), so the same solve can be rerun offline with the original
+    pacing. Requests missing from the archive fail like a dropped
+    connection and are counted as misses.
+    """
+
+    def __init__(self, archive: Dict[str, Any], speed: float = 1.0):
+        self.speed = speed
+        self.url = archive["log"].get("_recording", {}).get("url")
+        self.entries: Dict[Tuple[str, str], Deque[ReplayEntry]] = {}
+        self.by_path: Dict[Tuple[str, str], ReplayEntry] = {}
+        for har_entry in archive["log"]["entries"]:
+            if not har_entry["response"].get("status"):
+                # Failed or unfinished when recorded
+                continue
+            entry = ReplayEntry(har_entry)
+            self.entries.setdefault((entry.method, entry.url), deque()).append(entry)
+            self.by_path.setdefault((entry.method, entry.url.split("?", 1)[0]), entry)
+        if self.url is None and archive["log"]["entries"]:
+            self.url = archive["log"]["entries"][0]["request"]["url"]
+        self.served = 0
+        self.misses: List[str] = []
+        self.page = None
+        self.tasks = set()
+
+    def match(self, method: str, url: str) -> Optional[ReplayEntry]:
+        queue = self.entries.get((method, url))
+        if queue:
+            # Repeated requests get the recorded responses in order, then the last one again
+            return queue.popleft() if len(queue) > 1 else queue[0]
+        # Cache busters and timestamps in the query change between runs
+        return self.by_path.get((method, url.split("?", 1)[0]))
+
+    async def attach(self, page):
+        self.page = page
+        page.add_handler(page.fetch.RequestPaused, self.on_paused)
+        await page.send(page.fetch.enable(patterns=[page.fetch.RequestPattern(url_pattern="*")]))
+
+    async def detach(self, page):
+        page.remove_handler(page.fetch.RequestPaused, self.on_paused)
+        for task in list(self.tasks):
+            task.cancel()
+        await page.send(page.fetch.disable())
+
+    def on_paused(self, event):
+        # Answered in its own task so a slow response does not hold back the others
+        task = asyncio.ensure_future(self.respond(event))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def respond(self, event):
+        fetch = self.page.fetch
+        entry = self.match(event.request.method, event.request.url)
+        if entry is None:
+            self.misses.append(event.request.url)
+            await self.page.send(fetch.fail_request(event.request_id, self.page.network.ErrorReason.INTERNET_DISCONNECTED))
+            return
+        if self.speed > 0 and entry.time:
+            await asyncio.sleep(entry.time / 1000 * self.speed)
+        headers = [fetch.HeaderEntry(name, value) for name, value in entry.headers]
+        await self.page.send(fetch.fulfill_request(
+            event.request_id,
+            response_code=entry.status,
+            response_headers=headers,
+            body=base64.b64encode(entry.body).decode(),
+        ))
+        self.served += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"served": self.served, "misses": len(self.misses), "missed_urls": self.misses[:20]}
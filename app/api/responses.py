@@ -0,0 +1,85 @@
+import gzip
+import json
+from typing import Any, Dict, List, Optional
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOLUTION_FIELDS = (
+    "url",
+    "status",
+    "headers",
+    "response",
+    "cookies",
+    "userAgent",
+    "response_values",
+    "extracted",
+    "extractErrors",
+    "engine",
+    "escalationReason",
+    "challenge",
+    "network",
+)
+# Reported whatever the projection, so callers always know which engine served them and whether it came from the cache
+ALWAYS_INCLUDED_FIELDS = ("engine", "cached", "cacheAge")
+
+# Bodies smaller than this are cheaper to send as-is than to compress
+MIN_COMPRESS_SIZE = 1024
+
+
+def parseFields(fields: Any) -> Optional[List[str]]:
+    """Validate the `fields` projection of request.get, None means every field."""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    if not isinstance(fields, list) or not fields or not all(isinstance(field, str) for field in fields):
+        raise ValueError("fields must be a non-empty array of strings")
+    unknown = [field for field in fields if field not in SOLUTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {', '.join(unknown)}")
+    return fields
+
+
+def projectSolution(solution: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return solution
+    return {key: value for key, value in solution.items() if key in fields or key in ALWAYS_INCLUDED_FIELDS}
+
+
+def dumpJson(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(content, default=str).encode()
+
+
+def acceptedEncoding(request: Request) -> Optional[str]:
+    accept = request.headers.get("accept-encoding", "")
+    encodings = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings:
+        return "gzip"
+    return None
+
+
+def compressedJsonResponse(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Encode `content` as JSON and compress it when the client supports it."""
+    body = dumpJson(content)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = acceptedEncoding(request) if len(body) >= MIN_COMPRESS_SIZE else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,227 @@
+if __name__ == "__main__":
+    # Run as a script: the RETENTION_* settings below are read at import time
+    from dotenv import load_dotenv
+    load_dotenv()
+
+import asyncio
+import datetime
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, engine
+from app.models import Request, RetentionPolicy
+
+logger = logging.getLogger(__name__)
+
+# Global policy, 0 disables a limit. A user policy can only tighten these.
+RETENTION_MAX_AGE_DAYS = int(os.getenv("RETENTION_MAX_AGE_DAYS", "30"))
+RETENTION_MAX_ROWS = int(os.getenv("RETENTION_MAX_ROWS", "0"))
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))
+# Seconds between two background runs, 0 disables the background loop
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+# Rows deleted per transaction, keeps the write lock short for the request path
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+# Screenshots without a row are only removed once older than this, a task may be about to log them
+ORPHAN_GRACE_SECONDS = 3600
+
+POLICY_FIELDS = ("max_age_days", "max_rows", "max_bytes")
+
+_run_lock = threading.Lock()
+
+
+def globalPolicy() -> Dict[str, Optional[int]]:
+    return {
+        "max_age_days": RETENTION_MAX_AGE_DAYS or None,
+        "max_rows": RETENTION_MAX_ROWS or None,
+        "max_bytes": RETENTION_MAX_BYTES or None,
+    }
+
+
+def effectivePolicy(policy: Optional[RetentionPolicy]) -> Dict[str, Optional[int]]:
+    effective = globalPolicy()
+    for field in POLICY_FIELDS:
+        value = getattr(policy, field, None) if policy is not None else None
+        if value:
+            effective[field] = min(value, effective[field]) if effective[field] else value
+    return effective
+
+
+def databasePath() -> Optional[str]:
+    return engine.url.database if engine.url.get_backend_name() == "sqlite" else None
+
+
+def databaseBytes() -> int:
+    path = databasePath()
+    if not path:
+        return 0
+    return sum(os.path.getsize(file) for file in (path, path + "-wal") if os.path.exists(file))
+
+
+def screenshotPath(name: str) -> Optional[str]:
+    folder = os.getenv("SCREENSHOT_DIR")
+    if not folder or not name:
+        return None
+    return os.path.join(folder, os.path.basename(name))
+
+
+def removeScreenshots(names: List[Optional[str]]) -> Tuple[int, int]:
+    removed, size = 0, 0
+    for name in names:
+        path = screenshotPath(name)
+        if path is None:
+            continue
+        try:
+            file_size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning("Could not remove screenshot %s: %s", path, e)
+            continue
+        removed += 1
+        size += file_size
+    return removed, size
+
+
+async def getPolicy(db: AsyncSession, user_id: int) -> Optional[RetentionPolicy]:
+    result = await db.execute(select(RetentionPolicy).where(RetentionPolicy.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def setPolicy(db: AsyncSession, user_id: int, values: Dict[str, Optional[int]]) -> RetentionPolicy:
+    for field in POLICY_FIELDS:
+        if values.get(field) is not None and values[field] < 0:
+            raise ValueError(f"{field} must be positive")
+    policy = await getPolicy(db, user_id)
+    if policy is None:
+        policy = RetentionPolicy(user_id=user_id)
+        db.add(policy)
+    for field in POLICY_FIELDS:
+        setattr(policy, field, values.get(field) or None)
+    await db.commit()
+    await db.refresh(policy)
+    return policy
+
+
+def expiredQuery(user_id: int, policy: Dict[str, Optional[int]]):
+    """Queries selecting the next batch of rows each limit wants gone, oldest first."""
+    owned = Request.user_id == user_id
+    if policy["max_age_days"]:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=policy["max_age_days"])
+        # Index order, each purge batch is read without sorting the whole age range
+        yield select(Request.id, Request.screenShotName).where(owned, Request.created_at < cutoff).order_by(Request.created_at, Request.id)
+    newest_first = (Request.created_at.desc(), Request.id.desc())
+    if policy["max_rows"]:
+        yield select(Request.id, Request.screenShotName).where(owned).order_by(*newest_first).offset(policy["max_rows"])
+    if policy["max_bytes"]:
+        stored = func.sum(func.coalesce(func.length(Request.string_response), 0)).over(order_by=newest_first)
+        ranked = select(Request.id, Request.screenShotName, stored.label("stored")).where(owned).subquery()
+        yield select(ranked.c.id, ranked.c.screenShotName).where(ranked.c.stored > policy["max_bytes"])
+
+
+async def enforceUser(db: AsyncSession, user_id: int, report: Dict[str, int]):
+    policy = effectivePolicy(await getPolicy(db, user_id))
+    for query in expiredQuery(user_id, policy):
+        while True:
+            rows = (await db.execute(query.limit(RETENTION_BATCH_SIZE))).all()
+            if not rows:
+                break
+            await db.execute(delete(Request).where(Request.id.in_([row.id for row in rows])))
+            await db.commit()
+            # Files go only once their rows are gone, so no row points to a missing screenshot
+            removed, size = removeScreenshots([row.screenShotName for row in rows])
+            report["deleted_rows"] += len(rows)
+            report["deleted_screenshots"] += removed
+            report["screenshot_bytes"] += size
+            if len(rows) < RETENTION_BATCH_SIZE:
+                break
+
+
+async def sweepOrphanScreenshots(db: AsyncSession, report: Dict[str, int]):
+    folder = os.getenv("SCREENSHOT_DIR")
+    if not folder or not os.path.isdir(folder):
+        return
+    referenced = set((await db.execute(select(Request.screenShotName).where(Request.screenShotName.is_not(None)))).scalars())
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    orphans = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(".png") and entry.name not in referenced and entry.stat().st_mtime < cutoff:
+            orphans.append(entry.name)
+    removed, size = removeScreenshots(orphans)
+    report["orphan_screenshots"] += removed
+    report["screenshot_bytes"] += size
+
+
+async def compactDatabase():
+    """Give the pages freed by the deletions back to the filesystem.
+
+    The first run switches the database to incremental auto-vacuum, which
+    needs one full VACUUM; after that only the free pages are released.
+    """
+    if databasePath() is None:
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        auto_vacuum = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+        if auto_vacuum != 2:
+            logger.info("Switching the database to incremental auto-vacuum")
+            await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            await conn.exec_driver_sql("VACUUM")
+        else:
+            # Every freed page is one row of the result, it only completes once they are all read
+            (await conn.exec_driver_sql("PRAGMA incremental_vacuum")).fetchall()
+        (await conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")).fetchall()
+
+
+async def runRetention() -> Optional[Dict]:
+    """Apply every policy once and compact the database.
+
+    Returns the report, or None when another run is already in progress.
+    """
+    if not _run_lock.acquire(blocking=False):
+        return None
+    try:
+        start = time.time()
+        report = {"users": 0, "deleted_rows": 0, "deleted_screenshots": 0, "orphan_screenshots": 0, "screenshot_bytes": 0}
+        report["database_bytes_before"] = databaseBytes()
+        async with AsyncSessionLocal() as db:
+            user_ids = (await db.execute(select(Request.user_id).where(Request.user_id.is_not(None)).distinct())).scalars().all()
+            for user_id in user_ids:
+                await enforceUser(db, user_id, report)
+            report["users"] = len(user_ids)
+            await sweepOrphanScreenshots(db, report)
+        if report["deleted_rows"]:
+            await compactDatabase()
+        report["database_bytes_after"] = databaseBytes()
+        report["reclaimed_bytes"] = max(report["database_bytes_before"] - report["database_bytes_after"], 0) + report["screenshot_bytes"]
+        report["duration_ms"] = round((time.time() - start) * 1000, 1)
+        logger.info("Retention run finished", extra=report)
+        return report
+    finally:
+        _run_lock.release()
+
+
+async def retentionLoop():
+    """Background task started by the application lifespan."""
+    # Let startup and the first requests through before the first run
+    await asyncio.sleep(min(RETENTION_INTERVAL, 60))
+    while True:
+        try:
+            await runRetention()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Retention run failed")
+        await asyncio.sleep(RETENTION_INTERVAL)
+
+
+if __name__ == "__main__":
+    # python -m app.api.retention: one run from a shell or a cron job
+    import json
+    from app.logging_config import setupLogging
+    setupLogging()
+    print(json.dumps(asyncio.run(runRetention()), indent=2))
@@ -0,0 +1,281 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deadline import Deadline
+from app.api.throttle import TokenBucket
+from app.models import UserQuota
+
+# Jobs doing browser or HTTP work at once, across every tenant; 0 disables the limit
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", 8))
+# Defaults for users without a quota row, 0 disables that limit
+USER_MAX_CONCURRENT = int(os.getenv("USER_MAX_CONCURRENT", 4))
+USER_MAX_QUEUED = int(os.getenv("USER_MAX_QUEUED", 1000))
+USER_REQUESTS_PER_MINUTE = int(os.getenv("USER_REQUESTS_PER_MINUTE", 0))
+# Sleep between two looks at the grant flag while queued
+SCHEDULER_POLL_INTERVAL = 0.05
+# Queue latencies kept per tenant for the percentiles
+LATENCY_SAMPLES = 500
+
+QUOTA_FIELDS = ("max_concurrent", "max_queued", "requests_per_minute", "weight")
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Quota:
+    def __init__(self, max_concurrent: int = USER_MAX_CONCURRENT, max_queued: int = USER_MAX_QUEUED, requests_per_minute: int = USER_REQUESTS_PER_MINUTE, weight: float = 1.0):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.requests_per_minute = requests_per_minute
+        # Share of the slots relative to other tenants, at least one job per round
+        self.weight = max(float(weight), 1.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in QUOTA_FIELDS}
+
+
+class Job:
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.granted = False
+        self.queued_at = time.monotonic()
+
+
+class Flow:
+    """The waiting jobs of one tenant, taken round robin across its origins."""
+
+    def __init__(self, quota: Quota):
+        self.quota = quota
+        self.origins: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self.deficit = 0.0
+        self.queued = 0
+        self.running = 0
+        self.served = 0
+        self.rejected = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.bucket = self.newBucket()
+
+    def newBucket(self) -> Optional[TokenBucket]:
+        rpm = self.quota.requests_per_minute
+        return TokenBucket(rpm / 60, rpm) if rpm else None
+
+    def push(self, job: Job):
+        self.origins.setdefault(job.origin, deque()).append(job)
+        self.queued += 1
+
+    def pop(self) -> Job:
+        origin, jobs = next(iter(self.origins.items()))
+        job = jobs.popleft()
+        if jobs:
+            self.origins.move_to_end(origin)
+        else:
+            del self.origins[origin]
+        self.queued -= 1
+        return job
+
+    def remove(self, job: Job):
+        jobs = self.origins.get(job.origin)
+        if jobs is not None and job in jobs:
+            jobs.remove(job)
+            self.queued -= 1
+            if not jobs:
+                del self.origins[job.origin]
+
+
+class FairScheduler:
+    """Deficit round robin over tenants, with per-tenant quotas.
+
+    Each tenant with waiting jobs gets `weight` jobs started per round and
+    its own jobs alternate between its origins, so a tenant queueing
+    thousands of URLs delays a small tenant by at most one round. Tasks run
+    on their own threads and event loops: the state is behind a
+    threading.Lock and queued jobs poll their grant flag.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.flows: Dict[int, Flow] = {}
+        self.quotas: Dict[int, Quota] = {}
+        # Tenants with waiting jobs, in round robin order
+        self.active: Deque[int] = deque()
+        self.lock = threading.Lock()
+
+    def hasQuota(self, tenant: int) -> bool:
+        return tenant in self.quotas
+
+    def setQuota(self, tenant: int, quota: Quota):
+        with self.lock:
+            self.quotas[tenant] = quota
+            flow = self.flows.get(tenant)
+            if flow is not None:
+                flow.quota = quota
+                flow.bucket = flow.newBucket()
+            self._dispatch()
+
+    def _flow(self, tenant: int) -> Flow:
+        if tenant not in self.flows:
+            self.flows[tenant] = Flow(self.quotas.get(tenant) or Quota())
+        return self.flows[tenant]
+
+    def _admit(self, tenant: int, flow: Flow):
+        quota = flow.quota
+        if quota.max_queued and flow.queued >= quota.max_queued:
+            flow.rejected += 1
+            raise QuotaExceeded(f"Too many queued requests ({quota.max_queued} allowed)")
+        if flow.bucket is not None:
+            flow.bucket.refill(time.monotonic())
+            if flow.bucket.tokens < 1:
+                flow.rejected += 1
+                raise QuotaExceeded(f"Rate limit of {quota.requests_per_minute} requests per minute exceeded", flow.bucket.wait_time())
+            flow.bucket.tokens -= 1
+
+    def _next(self) -> Optional[Job]:
+        # Every tenant is visited at most twice: once to top up its deficit, once to serve
+        for _ in range(2 * len(self.active)):
+            tenant = self.active[0]
+            flow = self.flows[tenant]
+            if flow.quota.max_concurrent and flow.running >= flow.quota.max_concurrent:
+                self.active.rotate(-1)
+                continue
+            if flow.deficit < 1:
+                flow.deficit += flow.quota.weight
+                self.active.rotate(-1)
+                continue
+            flow.deficit -= 1
+            job = flow.pop()
+            flow.running += 1
+            if not flow.queued:
+                # An idle tenant does not bank credit for later
+                flow.deficit = 0.0
+                self.active.popleft()
+            elif flow.deficit < 1:
+                self.active.rotate(-1)
+            return job
+        return None
+
+    def _dispatch(self):
+        while self.active and (not self.max_concurrency or self.running < self.max_concurrency):
+            job = self._next()
+            if job is None:
+                return
+            self.running += 1
+            job.granted = True
+
+    def _forget(self, tenant: int, flow: Flow):
+        """Drop the flow of a tenant with nothing queued or running, as a new one would start the same.
+
+        Kept while its rate limit bucket is still refilling, a new flow would start it full.
+        """
+        if flow.queued or flow.running or tenant in self.active:
+            return
+        if flow.bucket is not None:
+            flow.bucket.refill(time.monotonic())
+            if flow.bucket.tokens < flow.bucket.burst:
+                return
+        del self.flows[tenant]
+
+    def _release(self, tenant: int):
+        with self.lock:
+            self.running -= 1
+            flow = self.flows[tenant]
+            flow.running -= 1
+            self._dispatch()
+            self._forget(tenant, flow)
+
+    @asynccontextmanager
+    async def slot(self, tenant: int, origin: str, deadline: Optional[Deadline] = None):
+        job = Job(origin)
+        with self.lock:
+            flow = self._flow(tenant)
+            self._admit(tenant, flow)
+            flow.push(job)
+            if tenant not in self.active:
+                self.active.append(tenant)
+            self._dispatch()
+        try:
+            while not job.granted:
+                if deadline is not None:
+                    deadline.check("scheduling")
+                await asyncio.sleep(SCHEDULER_POLL_INTERVAL)
+        except BaseException:
+            with self.lock:
+                if not job.granted:
+                    flow.remove(job)
+                    if not flow.queued and tenant in self.active:
+                        self.active.remove(tenant)
+                        flow.deficit = 0.0
+                    self._forget(tenant, flow)
+                    job = None
+            if job is not None:
+                # Granted between the last look and the cancellation
+                self._release(tenant)
+            raise
+        with self.lock:
+            flow.served += 1
+            flow.latencies.append(time.monotonic() - job.queued_at)
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            tenants = {}
+            for tenant, flow in self.flows.items():
+                latencies = sorted(flow.latencies)
+                tenants[tenant] = {
+                    "quota": flow.quota.to_dict(),
+                    "running": flow.running,
+                    "queued": flow.queued,
+                    "origins": len(flow.origins),
+                    "served": flow.served,
+                    "rejected": flow.rejected,
+                    "queue_latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                    "queue_latency_p95": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else 0.0,
+                    "queue_latency_max": round(latencies[-1], 3) if latencies else 0.0,
+                }
+            return {"max_concurrency": self.max_concurrency, "running": self.running, "tenants": tenants}
+
+
+def quotaFromRow(row: Optional[UserQuota]) -> Quota:
+    values = {field: getattr(row, field) for field in QUOTA_FIELDS if row is not None and getattr(row, field) is not None}
+    return Quota(**values)
+
+
+async def loadQuota(db: AsyncSession, user_id: int):
+    """Cache the user's quota in the scheduler the first time they submit work."""
+    if fairScheduler.hasQuota(user_id):
+        return
+    row = (await db.execute(select(UserQuota).where(UserQuota.user_id == user_id))).scalar_one_or_none()
+    fairScheduler.setQuota(user_id, quotaFromRow(row))
+
+
+async def setQuota(db: AsyncSession, user_id: int, values: Dict[str, Any]) -> Quota:
+    for field in QUOTA_FIELDS:
+        if values.get(field) is not None and values[field] < 0:
+            raise ValueError(f"{field} must be positive")
+    if values.get("weight") is not None and values["weight"] < 1:
+        raise ValueError("weight must be at least 1")
+    row = (await db.execute(select(UserQuota).where(UserQuota.user_id == user_id))).scalar_one_or_none()
+    if row is None:
+        row = UserQuota(user_id=user_id)
+        db.add(row)
+    for field in QUOTA_FIELDS:
+        setattr(row, field, values.get(field))
+    await db.commit()
+    quota = quotaFromRow(row)
+    fairScheduler.setQuota(user_id, quota)
+    return quota
+
+
+fairScheduler = FairScheduler(SCHEDULER_MAX_CONCURRENCY)
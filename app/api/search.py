@@ -0,0 +1,144 @@
+import asyncio
+import base64
+import html
+import logging
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# Text beyond this is not indexed, it keeps huge pages from bloating the index
+SEARCH_MAX_TEXT = 200_000
+SEARCH_MAX_RESULTS = 100
+# Rows indexed per transaction when backfilling existing history
+BACKFILL_BATCH_SIZE = 200
+
+# rowid is the id of the request. owner holds "u<user id>" so the scoping to
+# one user is part of the full-text match instead of a filter on its results.
+SEARCH_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS request_search USING fts5("
+    "text, url, owner, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS request_search_delete AFTER DELETE ON requests BEGIN "
+    "DELETE FROM request_search WHERE rowid = old.id; END",
+)
+SEARCH_QUERY = text(
+    "SELECT r.id, r.url, r.created_at, r.status_code, request_search.rank AS rank, "
+    "snippet(request_search, 0, '[', ']', '…', 16) AS snippet "
+    "FROM request_search JOIN requests r ON r.id = request_search.rowid "
+    "WHERE request_search MATCH :match AND r.user_id = :user_id "
+    "ORDER BY request_search.rank LIMIT :limit OFFSET :offset"
+)
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg"}
+WHITESPACE = re.compile(r"\s+")
+
+
+class TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.skipping = 0
+        self.size = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping and self.size < SEARCH_MAX_TEXT:
+            self.parts.append(data)
+            self.size += len(data)
+
+
+def extractText(content: str) -> str:
+    """Visible text of an HTML page, or the content itself when it is not HTML."""
+    if not content.lstrip()[:1] == "<":
+        return content[:SEARCH_MAX_TEXT]
+    parser = TextExtractor()
+    try:
+        parser.feed(content)
+        parser.close()
+    except Exception:
+        return WHITESPACE.sub(" ", html.unescape(re.sub(r"<[^>]+>", " ", content)))[:SEARCH_MAX_TEXT]
+    return WHITESPACE.sub(" ", " ".join(parser.parts)).strip()[:SEARCH_MAX_TEXT]
+
+
+def decodeStored(stored: Optional[str]) -> str:
+    if not stored:
+        return ""
+    try:
+        return base64.b64decode(stored).decode("utf-8", errors="replace")
+    except ValueError:
+        return stored
+
+
+def buildMatch(query: str, user_id: int, raw: bool) -> str:
+    """FTS5 match expression for `query` restricted to one user.
+
+    By default every word is quoted, so input is never parsed as FTS5 syntax;
+    `raw` passes the query through for phrase, prefix and boolean searches.
+    """
+    if not raw:
+        terms = [term.replace('"', '""') for term in query.split()]
+        query = " ".join(f'"{term}"' for term in terms)
+    # The user's expression only sees text and url, it cannot widen the owner filter
+    return f'owner:"u{user_id}" AND {{text url}}: ({query})'
+
+
+async def setupSearchIndex():
+    if engine.url.get_backend_name() != "sqlite":
+        return
+    async with engine.begin() as conn:
+        for statement in SEARCH_SCHEMA:
+            await conn.exec_driver_sql(statement)
+
+
+INDEX_STATEMENT = text("INSERT OR REPLACE INTO request_search (rowid, text, url, owner) VALUES (:id, :text, :url, :owner)")
+
+
+async def indexRequest(db: AsyncSession, request_id: int, user_id: int, url: str, content: str, commit: bool = True):
+    """Add one stored response to the index, called right after the row is written."""
+    # Parsing a large page takes a while, keep it off the event loop
+    page_text = await asyncio.to_thread(extractText, content)
+    await db.execute(INDEX_STATEMENT, {"id": request_id, "text": page_text, "url": url or "", "owner": f"u{user_id}"})
+    if commit:
+        await db.commit()
+
+
+async def backfillSearchIndex():
+    """Index the requests written before the index existed, in small batches."""
+    pending = text(
+        "SELECT id, user_id, url, string_response FROM requests "
+        "WHERE id > :after AND id NOT IN (SELECT rowid FROM request_search) ORDER BY id LIMIT :limit"
+    )
+    indexed, after = 0, 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows = (await db.execute(pending, {"after": after, "limit": BACKFILL_BATCH_SIZE})).all()
+            for row in rows:
+                await indexRequest(db, row.id, row.user_id, row.url, decodeStored(row.string_response), commit=False)
+            await db.commit()
+            indexed += len(rows)
+            if len(rows) < BACKFILL_BATCH_SIZE:
+                break
+            after = rows[-1].id
+    if indexed:
+        logger.info("Search index backfilled", extra={"indexed": indexed})
+
+
+async def searchRequests(db: AsyncSession, user_id: int, query: str, limit: int = 20, offset: int = 0, raw: bool = False) -> List[Dict[str, Any]]:
+    rows = await db.execute(SEARCH_QUERY, {
+        "match": buildMatch(query, user_id, raw),
+        "user_id": user_id,
+        "limit": min(limit, SEARCH_MAX_RESULTS),
+        "offset": offset,
+    })
+    return [dict(row._mapping) for row in rows]
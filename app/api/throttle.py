@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from app.api.deadline import Deadline
+
+# Longest single sleep while queued, so released slots are picked up quickly
+MAX_POLL_INTERVAL = 0.25
+# Seconds between two sweeps of idle domains, whose full buckets are no different from new ones
+PRUNE_INTERVAL = 60
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        if self.rate <= 0 or self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class DomainState:
+    def __init__(self):
+        self.active = 0
+        self.queued = 0
+        self.started = 0
+        self.throttled_seconds = 0.0
+
+
+class DomainThrottle:
+    """Per-domain and per-(domain, proxy) token buckets with a concurrency cap.
+
+    Work over the limits waits in line instead of being sent to the target,
+    which keeps bursts from one client from tripping harder challenges.
+    A rate or concurrency of 0 disables that limit.
+    """
+
+    def __init__(self, domain_rate: float, domain_burst: float, proxy_rate: float, proxy_burst: float, max_concurrency: int):
+        self.domain_rate = domain_rate
+        self.domain_burst = domain_burst
+        self.proxy_rate = proxy_rate
+        self.proxy_burst = proxy_burst
+        self.max_concurrency = max_concurrency
+        self.domain_buckets: Dict[str, TokenBucket] = {}
+        self.proxy_buckets: Dict[tuple, TokenBucket] = {}
+        self.domains: Dict[str, DomainState] = {}
+        self.lock = threading.Lock()
+        self.pruned_at = time.monotonic()
+
+    def _buckets(self, domain: str, proxy: Optional[str]):
+        if domain not in self.domain_buckets:
+            self.domain_buckets[domain] = TokenBucket(self.domain_rate, self.domain_burst)
+        key = (domain, proxy or "")
+        if key not in self.proxy_buckets:
+            self.proxy_buckets[key] = TokenBucket(self.proxy_rate, self.proxy_burst)
+        return self.domain_buckets[domain], self.proxy_buckets[key]
+
+    def _prune(self, now: float):
+        """Forget domains with nothing running or queued once their buckets have refilled. Called with the lock held."""
+        self.pruned_at = now
+        idle = {domain for domain, state in self.domains.items() if not state.active and not state.queued}
+        for buckets, domain_of in ((self.domain_buckets, lambda key: key), (self.proxy_buckets, lambda key: key[0])):
+            for key, bucket in list(buckets.items()):
+                if domain_of(key) in idle:
+                    bucket.refill(now)
+                    if bucket.tokens >= bucket.burst:
+                        del buckets[key]
+        busy = set(self.domain_buckets) | {domain for domain, _ in self.proxy_buckets}
+        for domain in idle - busy:
+            del self.domains[domain]
+
+    def _try_acquire(self, domain: str, proxy: Optional[str]) -> float:
+        """Take a slot and return 0, or return how long to wait before retrying."""
+        with self.lock:
+            state = self.domains[domain]
+            if self.max_concurrency and state.active >= self.max_concurrency:
+                return MAX_POLL_INTERVAL
+            now = time.monotonic()
+            buckets = self._buckets(domain, proxy)
+            for bucket in buckets:
+                bucket.refill(now)
+            wait = max(bucket.wait_time() for bucket in buckets)
+            if wait > 0:
+                return wait
+            for bucket in buckets:
+                if bucket.rate > 0:
+                    bucket.tokens -= 1
+            state.active += 1
+            state.started += 1
+            return 0.0
+
+    @asynccontextmanager
+    async def slot(self, url: str, proxy: Optional[str] = None, deadline: Optional[Deadline] = None):
+        domain = (urlsplit(url).hostname or "").lower()
+        with self.lock:
+            state = self.domains.setdefault(domain, DomainState())
+            state.queued += 1
+        queued_at = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(domain, proxy)
+                if wait == 0:
+                    break
+                if deadline is not None:
+                    deadline.check("queueing")
+                    wait = deadline.budget(wait) or MAX_POLL_INTERVAL
+                await asyncio.sleep(min(wait, MAX_POLL_INTERVAL))
+        finally:
+            with self.lock:
+                state.queued -= 1
+                state.throttled_seconds += time.monotonic() - queued_at
+        try:
+            yield
+        finally:
+            with self.lock:
+                state.active -= 1
+                now = time.monotonic()
+                if now - self.pruned_at >= PRUNE_INTERVAL:
+                    self._prune(now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                domain: {
+                    "active": state.active,
+                    "queued": state.queued,
+                    "started": state.started,
+                    "throttled_seconds": round(state.throttled_seconds, 3),
+                }
+                for domain, state in self.domains.items()
+            }
+
+
+domainThrottle = DomainThrottle(
+    domain_rate=float(os.getenv("DOMAIN_RATE_PER_SECOND", 2)),
+    domain_burst=float(os.getenv("DOMAIN_BURST", 5)),
+    proxy_rate=float(os.getenv("DOMAIN_PROXY_RATE_PER_SECOND", 1)),
+    proxy_burst=float(os.getenv("DOMAIN_PROXY_BURST", 3)),
+    max_concurrency=int(os.getenv("DOMAIN_MAX_CONCURRENCY", 4)),
+)
@@ -8,6 +8,7 @@ from sqlalchemy.future import select
 from app.database import AsyncSessionLocal
 from app.models import User
 from jose import jwt, JWTError  # Ajout de l'import pour jwt et JWTError
+import os
 
 # Security configuration
 SECRET_KEY = "your-secret-key-keep-it-secret" # In production, use environment variable
@@ -46,7 +47,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    print(token)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -60,4 +60,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    # Admins are configured by email, e.g. ADMIN_EMAILS=ops@example.com,me@example.com
+    admin_emails = [email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()]
+    if current_user.email not in admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
@@ -1,39 +1,33 @@
-import mycdp.network
 from app.models import ChromeSession
-import asyncio
-import platform
-import sys
-import mycdp
-from seleniumbase import Driver
-import nodriver as uc
-import cdp
-from app.models import User
-import traceback
-import json
+from app.startup import startupTimer
+from app.browser_manager.session_queue import SessionQueue
+import logging
 import os
-import datetime
-from typing import Union
+from typing import Optional
+
+logger = logging.getLogger(__name__)
 
-from seleniumbase import SB
 # Store browser sessions
 browserSessions = []
 
+# Parallel tabs a session may open, each serves one request at a time
+SESSION_MAX_TABS = int(os.getenv("SESSION_MAX_TABS", 4))
 
-
-
-
-async def newSession(session: ChromeSession):
-    browser = await NewDriver()
+async def newSession(session: ChromeSession, tabs: int = 1):
+    browser = await NewDriver(session.proxy)
+    pages = [browser]
+    for _ in range(tabs - 1):
+        pages.append(await browser.new_tab())
     browserSession = {
         "session": session,
-        "browser": browser
+        "browser": browser,
+        "queue": SessionQueue(pages),
     }
     browserSessions.append(browserSession)
     return browser
 
-async def getSession(session: str) -> Driver:
+async def getSession(session: str) -> Optional[dict]:
     for browserSession in browserSessions:
-        print(browserSession["session"].session_id, session)
         if browserSession["session"].session_id == session:
             return browserSession
     return None
@@ -41,18 +35,56 @@ async def getSession(session: str) -> Driver:
 async def deleteSession(session: ChromeSession) -> bool:
     for i, browserSession in enumerate(browserSessions):
         if browserSession["session"].session_id == session.session_id:
-            browserSession["browser"].quit()
+            # Waiting requests fail fast, the ones in flight see the browser go away
+            browserSession["queue"].close()
+            await browserSession["browser"].quit()
             del browserSessions[i]
             return True
     return False
 
+async def closeAllSessions() -> int:
+    """Quit every session's browser, at shutdown."""
+    closed = 0
+    while browserSessions:
+        browserSession = browserSessions.pop()
+        browserSession["queue"].close()
+        try:
+            await browserSession["browser"].quit()
+            closed += 1
+        except Exception as e:
+            logger.warning("Could not quit the browser of session %s: %s", browserSession["session"].session_id, e)
+    return closed
+
+def engineName() -> str:
+    # "seleniumbase" (default, one thread per request) or "nodriver" (fully async on the app event loop)
+    return os.getenv("BROWSER_ENGINE", "seleniumbase")
+
+def engineClass():
+    # The engine modules pull in seleniumbase/nodriver and are only imported on first use
+    if engineName() == "nodriver":
+        with startupTimer.importing("app.browser_manager.nodriver_engine"):
+            from app.browser_manager.nodriver_engine import NodriverPage
+        return NodriverPage
+    with startupTimer.importing("app.browser_manager.seleniumbase_engine"):
+        from app.browser_manager.seleniumbase_engine import SeleniumbasePage
+    return SeleniumbasePage
+
+def engineSupportsTabs() -> bool:
+    return engineName() == "nodriver"
+
+def sessionStats(session_ids) -> dict:
+    return {
+        browserSession["session"].session_id: browserSession["queue"].stats()
+        for browserSession in browserSessions
+        if browserSession["session"].session_id in session_ids
+    }
 
+def engineRunsOnEventLoop() -> bool:
+    # Answered from the configuration so routing a request does not import the engine
+    return engineName() == "nodriver"
 
-
-async def NewDriver():
-    d = Driver(uc=True, locale_code="en", headless=False)
-
-    return d
+async def NewDriver(proxy: str = None):
+    return await engineClass().launch(proxy)
 
 
 
@@ -0,0 +1,88 @@
+import os
+import nodriver as uc
+from nodriver import cdp
+from app.util import proxyServer
+
+
+class NodriverPage:
+    """Chrome driven through nodriver's fully async CDP client.
+
+    Every call yields to the event loop, so many page loads can be multiplexed
+    on the application loop without a thread per request.
+    """
+
+    network = cdp.network
+    fetch = cdp.fetch
+    runs_on_event_loop = True
+    supports_tabs = True
+
+    def __init__(self, browser: uc.Browser, tab: uc.Tab):
+        self.browser = browser
+        self.tab = tab
+
+    @classmethod
+    async def launch(cls, proxy: str = None) -> "NodriverPage":
+        browser_args = [f"--proxy-server={proxyServer(proxy)}"] if proxy else []
+        browser = await uc.start(headless=False, lang="en", browser_args=browser_args)
+        return cls(browser, browser.main_tab)
+
+    async def activate(self):
+        await self.tab.get("about:blank")
+        await self.tab.send(cdp.network.enable())
+
+    def add_handler(self, event, handler):
+        self.tab.add_handler(event, handler)
+
+    def remove_handler(self, event, handler):
+        self.tab.remove_handler(event, handler)
+
+    async def new_tab(self) -> "NodriverPage":
+        # Tabs of one browser share its cookie jar
+        tab = await self.browser.get("about:blank", new_tab=True)
+        return NodriverPage(self.browser, tab)
+
+    async def send(self, command):
+        return await self.tab.send(command)
+
+    async def set_cookies(self, cookies: list):
+        # One Network.setCookies for the whole list, applied before the first request
+        await self.tab.send(cdp.network.set_cookies([cdp.network.CookieParam.from_json(cookie) for cookie in cookies]))
+
+    async def set_extra_headers(self, headers: dict):
+        await self.tab.send(cdp.network.set_extra_http_headers(cdp.network.Headers(headers)))
+
+    async def open(self, url: str):
+        await self.tab.get(url)
+
+    async def reload(self):
+        await self.tab.reload()
+
+    async def evaluate(self, expression: str):
+        return await self.tab.evaluate(expression, return_by_value=True)
+
+    async def type(self, selector: str, text: str):
+        element = await self.tab.select(selector)
+        await element.send_keys(text)
+
+    async def wait_for_selector(self, selector: str, timeout: float):
+        await self.tab.select(selector, timeout=timeout)
+
+    async def get_cookies(self) -> list:
+        return [cookie.to_json() for cookie in await self.browser.cookies.get_all()]
+
+    async def get_content(self) -> str:
+        return await self.tab.get_content()
+
+    async def get_user_agent(self) -> str:
+        return await self.tab.evaluate("navigator.userAgent")
+
+    async def get_response_body(self, request_id):
+        return await self.tab.send(cdp.network.get_response_body(request_id))
+
+    async def save_screenshot(self, name: str, folder: str) -> str:
+        path = os.path.join(folder or ".", name)
+        await self.tab.save_screenshot(path)
+        return path
+
+    async def quit(self):
+        self.browser.stop()
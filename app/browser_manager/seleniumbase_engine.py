@@ -0,0 +1,85 @@
+import mycdp
+import mycdp.fetch
+import mycdp.network
+from seleniumbase import Driver
+from app.util import proxyServer
+
+
+class SeleniumbasePage:
+    """seleniumbase UC driver in CDP mode.
+
+    Every call blocks the calling thread, so requests on this engine each run
+    on their own thread and event loop (see routes.flaresolver).
+    """
+
+    network = mycdp.network
+    fetch = mycdp.fetch
+    runs_on_event_loop = False
+    # The CDP-mode wrapper drives one active tab at a time
+    supports_tabs = False
+
+    def __init__(self, driver: Driver):
+        self.driver = driver
+
+    @classmethod
+    async def launch(cls, proxy: str = None) -> "SeleniumbasePage":
+        return cls(Driver(uc=True, locale_code="en", headless=False, proxy=proxyServer(proxy)))
+
+    async def activate(self):
+        self.driver.uc_activate_cdp_mode("about:blank")
+
+    def add_handler(self, event, handler):
+        self.driver.cdp.add_handler(event, handler)
+
+    def remove_handler(self, event, handler):
+        handlers = self.driver.cdp.page.handlers.get(event, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def cdp_send(self, command):
+        cdp = self.driver.cdp
+        return cdp.loop.run_until_complete(cdp.page.send(command))
+
+    async def send(self, command):
+        return self.cdp_send(command)
+
+    async def set_cookies(self, cookies: list):
+        # One Network.setCookies for the whole list, applied before the first request
+        self.cdp_send(mycdp.network.set_cookies([mycdp.network.CookieParam.from_json(cookie) for cookie in cookies]))
+
+    async def set_extra_headers(self, headers: dict):
+        self.cdp_send(mycdp.network.enable())
+        self.cdp_send(mycdp.network.set_extra_http_headers(mycdp.network.Headers(headers)))
+
+    async def open(self, url: str):
+        self.driver.cdp.open(url)
+
+    async def reload(self):
+        self.driver.cdp.reload()
+
+    async def evaluate(self, expression: str):
+        return self.driver.cdp.evaluate(expression)
+
+    async def type(self, selector: str, text: str):
+        self.driver.cdp.type(selector, text)
+
+    async def wait_for_selector(self, selector: str, timeout: float):
+        self.driver.cdp.wait_for_selector(selector, timeout=timeout)
+
+    async def get_cookies(self) -> list:
+        return [cookie.to_json() if hasattr(cookie, "to_json") else cookie for cookie in self.driver.cdp.get_all_cookies()]
+
+    async def get_content(self) -> str:
+        return self.driver.cdp.get_page_source()
+
+    async def get_user_agent(self) -> str:
+        return self.driver.get_user_agent()
+
+    async def get_response_body(self, request_id):
+        return self.cdp_send(mycdp.network.get_response_body(request_id))
+
+    async def save_screenshot(self, name: str, folder: str) -> str:
+        return self.driver.cdp.save_screenshot(name, folder)
+
+    async def quit(self):
+        self.driver.quit()
@@ -0,0 +1,96 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from app.api.deadline import Deadline
+
+# Requests allowed to wait for a session before new ones are turned away
+SESSION_QUEUE_DEPTH = int(os.getenv("SESSION_QUEUE_DEPTH", 16))
+# Sleep between two looks at the queue while waiting for a tab
+SESSION_POLL_INTERVAL = 0.05
+
+
+class SessionBusy(Exception):
+    pass
+
+
+class SessionClosed(Exception):
+    pass
+
+
+class SessionQueue:
+    """Hands the tabs of one browser session to requests, one request per tab.
+
+    Requests are served in arrival order. Tasks run on different threads and
+    event loops, so the state sits behind a threading.Lock and waiters poll
+    instead of awaiting a loop-bound primitive.
+    """
+
+    def __init__(self, pages: List[Any], max_depth: int = SESSION_QUEUE_DEPTH):
+        self.pages = list(pages)
+        self.free = list(pages)
+        self.max_depth = max_depth
+        self.waiting: deque = deque()
+        self.tickets = itertools.count()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def acquire(self, deadline: Optional[Deadline] = None):
+        with self.lock:
+            if self.closed:
+                raise SessionClosed("Session was destroyed")
+            if len(self.waiting) >= self.max_depth:
+                self.rejected += 1
+                raise SessionBusy(f"Session queue is full ({self.max_depth} waiting)")
+            ticket = next(self.tickets)
+            self.waiting.append(ticket)
+        queued_at = time.monotonic()
+        try:
+            while True:
+                with self.lock:
+                    if self.closed:
+                        raise SessionClosed("Session was destroyed")
+                    if self.waiting[0] == ticket and self.free:
+                        self.waiting.popleft()
+                        page = self.free.pop(0)
+                        waited = time.monotonic() - queued_at
+                        self.served += 1
+                        self.total_wait += waited
+                        self.max_wait = max(self.max_wait, waited)
+                        return page
+                if deadline is not None:
+                    deadline.check("session queue")
+                await asyncio.sleep(SESSION_POLL_INTERVAL)
+        except BaseException:
+            with self.lock:
+                if ticket in self.waiting:
+                    self.waiting.remove(ticket)
+            raise
+
+    def release(self, page):
+        with self.lock:
+            if page in self.pages and page not in self.free:
+                self.free.append(page)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "tabs": len(self.pages),
+                "active": len(self.pages) - len(self.free),
+                "queued": len(self.waiting),
+                "served": self.served,
+                "rejected": self.rejected,
+                "avg_wait_seconds": round(self.total_wait / self.served, 3) if self.served else 0.0,
+                "max_wait_seconds": round(self.max_wait, 3),
+            }
@@ -1,10 +1,19 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import delete
+from sqlalchemy import delete, inspect
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./sql_app.db"
+# Migrations live next to the app package, found from here whatever the working directory
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The schema create_all used to build, databases without alembic_version are at this revision
+BASELINE_REVISION = "0001"
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+# Statement logging is opt-in, it is far too chatty for the request hot path
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=os.getenv("SQL_ECHO", "false") == "true")
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
@@ -22,10 +31,32 @@ async def clear_chrome_sessions():
         from app.models import ChromeSession  # Import here to avoid circular import
         await session.execute(delete(ChromeSession))
         await session.commit()
-        print("All Chrome sessions have been cleared from the database")
+        logger.info("All Chrome sessions have been cleared from the database")
+
+def alembic_config(connection=None):
+    from alembic.config import Config
+    config = Config(os.path.join(PROJECT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_DIR, "alembic"))
+    if connection is not None:
+        # env.py runs on this connection instead of opening its own
+        config.attributes["connection"] = connection
+    return config
+
+def run_migrations(connection):
+    """Upgrade the schema to the latest revision, on a sync connection from run_sync."""
+    from alembic import command
+    from app import models  # noqa: F401, create_all below needs every table registered
+    config = alembic_config(connection)
+    tables = inspect(connection).get_table_names()
+    if "alembic_version" not in tables and "users" in tables:
+        # Built by create_all before migrations existed: add the tables newer than it, then take over
+        logger.info("Stamping the existing database at revision %s", BASELINE_REVISION)
+        Base.metadata.create_all(connection)
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
 
 async def init_db():
-    """Initialize the database and clear Chrome sessions."""
+    """Migrate the database and clear Chrome sessions."""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
     await clear_chrome_sessions()
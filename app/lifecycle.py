@@ -0,0 +1,216 @@
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Holds the PID of the running server, a stale one means the last run did not shut down cleanly
+PID_FILE = os.getenv("PID_FILE", "./cloudscrapper.pid")
+# How long shutdown waits for running tasks before cancelling them
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", 20))
+# How long cancelled tasks get to reach their next boundary and quit their browser
+SHUTDOWN_CANCEL_SECONDS = float(os.getenv("SHUTDOWN_CANCEL_SECONDS", 5))
+# Kill browsers and remove profiles left behind by a previous run at startup
+REAP_ORPHANS = os.getenv("REAP_ORPHANS", "true") == "true"
+# Seconds between SIGTERM and SIGKILL for an orphaned browser
+REAP_KILL_TIMEOUT = 3
+# Executables started by seleniumbase and nodriver
+BROWSER_PROCESS_NAMES = {"chrome", "chromium", "chromium-browser", "google-chrome", "headless_shell", "chromedriver", "uc_driver"}
+# Temporary profile directories: nodriver names them uc_*, seleniumbase's UC mode uses plain mkdtemp
+PROFILE_PREFIXES = ("uc_", "tmp")
+PROC_DIR = "/proc"
+
+
+class Lifecycle:
+    """Whether the server still takes new work.
+
+    Draining starts on shutdown, or earlier from the admin endpoint so a load
+    balancer can move traffic away before the process is stopped.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.drain_started: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def beginDrain(self) -> bool:
+        """Returns False when the server was already draining."""
+        with self.lock:
+            if self.draining:
+                return False
+            self.draining = True
+            self.drain_started = time.monotonic()
+        logger.info("Draining, new work is refused")
+        return True
+
+    def retryAfter(self) -> int:
+        # Long enough for the process to be replaced
+        return int(SHUTDOWN_GRACE_SECONDS + SHUTDOWN_CANCEL_SECONDS)
+
+    def status(self) -> Dict[str, object]:
+        with self.lock:
+            return {
+                "draining": self.draining,
+                "drainingSeconds": round(time.monotonic() - self.drain_started, 1) if self.drain_started else None,
+            }
+
+
+def pidAlive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by someone else
+        return True
+    return True
+
+
+def readPidFile() -> Optional[int]:
+    try:
+        with open(PID_FILE) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def writePidFile():
+    try:
+        with open(PID_FILE, "w") as f:
+            f.write(str(os.getpid()))
+    except OSError as e:
+        logger.warning("Could not write the PID file %s: %s", PID_FILE, e)
+
+
+def removePidFile():
+    # Only our own, a newer instance may already have replaced it
+    if readPidFile() == os.getpid():
+        try:
+            os.remove(PID_FILE)
+        except OSError:
+            pass
+
+
+def listProcesses() -> List[Dict[str, object]]:
+    """pid, parent, name and command line of the processes of this user, from /proc."""
+    processes = []
+    uid = os.getuid()
+    for entry in os.listdir(PROC_DIR):
+        if not entry.isdigit():
+            continue
+        path = os.path.join(PROC_DIR, entry)
+        try:
+            if os.stat(path).st_uid != uid:
+                continue
+            with open(os.path.join(path, "stat")) as f:
+                stat = f.read()
+            with open(os.path.join(path, "cmdline"), "rb") as f:
+                cmdline = [part.decode(errors="replace") for part in f.read().split(b"\0") if part]
+        except OSError:
+            # Exited while we were looking
+            continue
+        # The name is in parentheses and may itself contain spaces or parentheses
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        processes.append({"pid": int(entry), "ppid": ppid, "name": name, "cmdline": cmdline})
+    return processes
+
+
+def isAutomatedBrowser(process: Dict[str, object]) -> bool:
+    cmdline = process["cmdline"]
+    executable = os.path.basename(cmdline[0]) if cmdline else process["name"]
+    if executable not in BROWSER_PROCESS_NAMES and process["name"] not in BROWSER_PROCESS_NAMES:
+        return False
+    if "driver" in executable:
+        return True
+    # A user's own Chrome has no debugging port, both engines always set one
+    return any(arg.startswith("--remote-debugging-port") for arg in cmdline)
+
+
+def findOrphanBrowsers(processes: List[Dict[str, object]]) -> List[int]:
+    """Automated browsers and drivers whose parent died, with all their descendants.
+
+    At startup nothing has been launched yet, so a browser reparented to init
+    or to this process (when it is PID 1 in a container) is a leftover.
+    """
+    roots = [
+        process["pid"] for process in processes
+        if process["ppid"] in (1, os.getpid()) and isAutomatedBrowser(process)
+    ]
+    children: Dict[int, List[int]] = {}
+    for process in processes:
+        children.setdefault(process["ppid"], []).append(process["pid"])
+    orphans, stack = [], list(roots)
+    while stack:
+        pid = stack.pop()
+        orphans.append(pid)
+        stack.extend(children.get(pid, []))
+    return orphans
+
+
+def killProcesses(pids: List[int]) -> int:
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+    give_up_at = time.monotonic() + REAP_KILL_TIMEOUT
+    alive = list(pids)
+    while alive and time.monotonic() < give_up_at:
+        time.sleep(0.1)
+        for pid in alive:
+            try:
+                # Orphans reparented to this process stay zombies until collected
+                os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                pass
+        alive = [pid for pid in alive if pidAlive(pid)]
+    for pid in alive:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    return len(pids)
+
+
+def removeStaleProfiles(processes: List[Dict[str, object]]) -> int:
+    """Delete temporary Chrome profiles that no running process points at."""
+    directory = tempfile.gettempdir()
+    in_use = {arg.split("=", 1)[1] for process in processes for arg in process["cmdline"] if arg.startswith("--user-data-dir=")}
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.startswith(PROFILE_PREFIXES) or path in in_use or not os.path.isdir(path):
+            continue
+        # Only directories Chrome has written to, other programs use tmp* too
+        if not os.path.exists(os.path.join(path, "Local State")):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def cleanupPreviousRun() -> Dict[str, int]:
+    """Reap what an earlier run left behind, then claim the PID file."""
+    report = {"browsers": 0, "profiles": 0}
+    previous = readPidFile()
+    if previous is not None and previous != os.getpid() and pidAlive(previous):
+        # Another instance shares this directory, its browsers are not orphans
+        logger.warning("PID file %s belongs to running process %s, skipping orphan cleanup", PID_FILE, previous)
+    elif REAP_ORPHANS and os.path.isdir(PROC_DIR):
+        if previous is not None and previous != os.getpid():
+            logger.warning("Process %s did not shut down cleanly", previous)
+        report["browsers"] = killProcesses(findOrphanBrowsers(listProcesses()))
+        report["profiles"] = removeStaleProfiles(listProcesses())
+        if report["browsers"] or report["profiles"]:
+            logger.info("Removed %s orphaned browser processes and %s stale profiles", report["browsers"], report["profiles"])
+    writePidFile()
+    return report
+
+
+lifecycle = Lifecycle()
@@ -0,0 +1,148 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+# Correlation fields attached to every record logged while a task runs
+task_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("task_id", default=None)
+session_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+origin_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("origin", default=None)
+
+# Attributes every LogRecord has, anything else was passed through `extra=`
+RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "task_id", "session_id", "origin"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampling_filter: Optional["SamplingFilter"] = None
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.task_id = task_id_var.get()
+        record.session_id = session_id_var.get()
+        record.origin = origin_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records of each level, e.g. {"DEBUG": 0.01}.
+
+    Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("task_id", "session_id", "origin"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener.
+
+    The stock prepare() merges the arguments into the message and formats the
+    traceback on the calling thread. Here the record is queued as it is, so
+    its arguments are rendered later: they must not change after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A copy, other handlers of the same logger still see the original
+        return copy.copy(record)
+
+
+def parseSamplingRates(value: str) -> Dict[int, float]:
+    # "DEBUG=0.01,INFO=0.5"
+    rates = {}
+    for part in value.split(","):
+        if "=" in part:
+            level, rate = part.split("=", 1)
+            rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+def setupLogging():
+    """Route every log record through a queue drained by a background thread.
+
+    Callers only pay for enqueueing; formatting and the write to stdout happen
+    on the listener thread. LOG_FORMAT=text keeps the plain format for local runs.
+    """
+    global _listener, _sampling_filter
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json") == "text":
+        output.setFormatter(logging.Formatter("%(levelname)s [%(name)s] [task=%(task_id)s] %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    _sampling_filter = SamplingFilter(parseSamplingRates(os.getenv("LOG_SAMPLING", "")))
+    queue_handler.addFilter(_sampling_filter)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stopLogging)
+
+
+def stopLogging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def getLoggingConfig() -> Dict:
+    loggers = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in logging.root.manager.loggerDict.items():
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            loggers[name] = logging.getLevelName(logger.level)
+    sampling = {logging.getLevelName(level): rate for level, rate in _sampling_filter.rates.items()} if _sampling_filter else {}
+    return {"levels": loggers, "sampling": sampling}
+
+
+def setLogLevel(level: str, logger_name: Optional[str] = None):
+    logging.getLogger(logger_name).setLevel(level.upper())
+
+
+def setSamplingRate(level: str, rate: float):
+    levelno = logging.getLevelName(level.upper())
+    if not isinstance(levelno, int):
+        raise ValueError(f"Unknown level {level}")
+    if _sampling_filter is not None:
+        _sampling_filter.rates[levelno] = rate
@@ -1,14 +1,15 @@
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import logging
 from app.routes import router
+from app.logging_config import setupLogging
+from app.static_files import CachedStaticFiles
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+setupLogging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="CloudScrapper API")
@@ -38,12 +39,10 @@ logger.info(f"Static directory contents: {os.listdir(static_dir)}")
 # Include API routes with a prefix
 app.include_router(router, prefix="/api")
 
-# Mount the static files directory
-try:
-    app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
-    logger.info("Successfully mounted static files directory")
-except Exception as e:
-    logger.error(f"Error mounting static files: {str(e)}")
+# Serve the dashboard from memory, precompressed and with cache validators
+static_files = CachedStaticFiles(static_dir)
+app.mount("/", static_files, name="static")
+logger.info("Successfully mounted static files directory")
 
 # Custom exception handler for 404 errors
 @app.exception_handler(StarletteHTTPException)
@@ -58,22 +57,12 @@ async def custom_http_exception_handler(request: Request, exc: StarletteHTTPExce
                 content={"detail": "Not Found"}
             )
         
-        # For non-API routes, try to serve index.html
-        try:
-            index_path = os.path.join(static_dir, "index.html")
-            logger.info(f"Trying to serve index.html from {index_path}")
-            logger.info(f"Index file exists: {os.path.exists(index_path)}")
-            
-            if os.path.exists(index_path):
-                with open(index_path, "r") as f:
-                    content = f.read()
-                return HTMLResponse(content=content)
-            else:
-                logger.error(f"index.html not found at {index_path}")
-                return HTMLResponse(content="<html><body><h1>404 Not Found</h1><p>The static file could not be found.</p></body></html>", status_code=404)
-        except Exception as e:
-            logger.error(f"Error serving index.html: {str(e)}")
-            return HTMLResponse(content=f"<html><body><h1>Error</h1><p>{str(e)}</p></body></html>", status_code=500)
+        # For non-API routes, serve the index.html held in memory
+        index = static_files.index()
+        if index is not None:
+            return static_files.response(request, index)
+        logger.error(f"index.html not found in {static_dir}")
+        return HTMLResponse(content="<html><body><h1>404 Not Found</h1><p>The static file could not be found.</p></body></html>", status_code=404)
     
     # For other errors, use default exception handling
     raise exc
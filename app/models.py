@@ -1,9 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped
 from app.database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, UniqueConstraint
 
 
 class User(Base):
@@ -18,6 +18,7 @@ class User(Base):
     allowed_origins = relationship("AllowedOrigin", back_populates="owner")
     chrome_sessions = relationship("ChromeSession", back_populates="user")
     requests = relationship("Request", back_populates="user")
+    retention_policy = relationship("RetentionPolicy", back_populates="user", uselist=False)
 
 class AllowedOrigin(Base):
     __tablename__ = "allowed_origins"
@@ -26,13 +27,15 @@ class AllowedOrigin(Base):
     origin = Column(String, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    owner_id : Mapped[int] = Column(Integer, ForeignKey("users.id"))
+    owner_id : Mapped[int] = Column(Integer, ForeignKey("users.id"), index=True)
     owner: Mapped["User"] = relationship("User", back_populates="allowed_origins")
     requests = relationship("Request", back_populates="request_origin")
     disabled = Column(Boolean, default=False)
 
 class Request(Base):
     __tablename__ = "requests"
+    # History, export and retention all filter on the user and order or cut on the date
+    __table_args__ = (Index("ix_requests_user_id_created_at", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     method = Column(String)
@@ -44,7 +47,7 @@ class Request(Base):
     request_origin_id = Column(Integer, ForeignKey("allowed_origins.id"))
     request_origin = relationship("AllowedOrigin", back_populates="requests")
     chrome_session = relationship("ChromeSession", back_populates="requests",)
-    chrome_session_id = Column(Integer, ForeignKey("chrome_sessions.id"))
+    chrome_session_id = Column(Integer, ForeignKey("chrome_sessions.id"), index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", back_populates="requests")
     status_code = Column(Integer)
@@ -60,8 +63,56 @@ class ChromeSession(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     requests = relationship("Request", back_populates="chrome_session")
     proxy = Column(String, nullable=True) # Assuming you have a proxy field
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     user = relationship("User", back_populates="chrome_sessions")
 
+class RetentionPolicy(Base):
+    __tablename__ = "retention_policies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    # Null means the global default from the RETENTION_* environment variables applies
+    max_age_days = Column(Integer, nullable=True)
+    max_rows = Column(Integer, nullable=True)
+    max_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    user = relationship("User", back_populates="retention_policy")
+
+class UserQuota(Base):
+    __tablename__ = "user_quotas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    # Null means the scheduler default from the environment applies
+    max_concurrent = Column(Integer, nullable=True)
+    max_queued = Column(Integer, nullable=True)
+    requests_per_minute = Column(Integer, nullable=True)
+    weight = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class DomainProfile(Base):
+    __tablename__ = "domain_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain = Column(String, unique=True, index=True)
+    # Decayed outcome counters as JSON, see app.api.profiles.ProfileStats
+    stats = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class CookieJar(Base):
+    __tablename__ = "cookie_jars"
+    __table_args__ = (UniqueConstraint("user_id", "name"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    name = Column(String)
+    # CDP CookieParam objects as a JSON array
+    cookies = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
 class Config:
     from_attributes = True
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks, Query
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.exceptions import HTTPException as StarletteHTTPException
 from fastapi.responses import HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from datetime import timedelta
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timedelta
 from app.database import AsyncSessionLocal
 import os
 from app import models, schemas
@@ -15,26 +16,57 @@ from app.auth import (
     verify_password, 
     create_access_token, 
     get_current_user,
+    get_current_admin,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from fastapi import Request, Response
 from app.api.flaresolver import flaresolverRoute
 from app.api.allowedHost import create_allowed_host, delete_allowed_host, get_user_allowed_hosts
-import nodriver as uc
+from app.api.responses import MIN_COMPRESS_SIZE, acceptedEncoding, compressedJsonResponse
+from app.api.body_store import RangeNotSatisfiable, bodyStore, parseRange, spoolResult
+from app.api.export import EXPORT_FORMATS, exportRequests
+from app.api.search import searchRequests
+from app.api.throttle import domainThrottle
+from app.api.scheduler import fairScheduler, setQuota
+from app.api.cookie_jar import CookieJarBusy, deleteCookieJar, getCookieJar, jarCookies, listCookieJars, storeCookieJar, validJarName
+from app.api.profiles import listProfiles, loadDomain, resetProfile
+from app.api.retention import POLICY_FIELDS, effectivePolicy, getPolicy, runRetention, setPolicy
+from app.util import isTruthy
+from app.browser_manager.manager import engineRunsOnEventLoop, sessionStats
 import threading
-from typing import List, Dict, Any
-import httpx
-from urllib.parse import urljoin
+from typing import List, Dict, Any, Optional
 import asyncio
 import uuid
+import concurrent.futures
 from contextlib import asynccontextmanager
 import time
+import logging
+from app.logging_config import task_id_var, getLoggingConfig, setLogLevel, setSamplingRate
+from app.startup import startupTimer
+from app.lifecycle import SHUTDOWN_CANCEL_SECONDS, SHUTDOWN_GRACE_SECONDS, lifecycle
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Task storage for background tasks
 task_results = {}
 task_status = {}
+# Resolved when a task finishes, so synchronous callers don't have to poll
+task_futures: Dict[str, concurrent.futures.Future] = {}
+# Set to stop a task at its next navigation, wait or action boundary
+task_cancel_events: Dict[str, threading.Event] = {}
+# asyncio tasks of the async engine, referenced until done so they are not garbage collected
+running_tasks = set()
+
+# Extra time a synchronous caller waits past maxTimeout for the task to report its timeout
+SYNC_GRACE_SECONDS = 5
+# How often a synchronous caller's connection is checked while its task runs
+SYNC_DISCONNECT_CHECK_INTERVAL = 1
+# Longest a GET /v1/tasks/{id}?wait=true holds the connection
+LONG_POLL_MAX_SECONDS = 120
+# How often a drain looks at the tasks still running
+DRAIN_POLL_INTERVAL = 0.2
 
 # Create static directory if it doesn't exist
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
@@ -42,16 +74,85 @@ if not os.path.exists(static_dir):
     os.makedirs(static_dir)
 
 # Background task function
-async def process_flaresolver_request(task_id: str, data: Dict[str, Any], client_ip: str, db: AsyncSession):
+async def process_flaresolver_request(task_id: str, data: Dict[str, Any], client_ip: str, db: AsyncSession, submitted_at: float = None):
+    task_id_var.set(task_id)
+    # Kept here, a GET /v1/tasks/{id} may pop the entry before the future is resolved
+    final_status = "failed"
+    future = task_futures.get(task_id)
     try:
-        task_status[task_id] = "processing"
-        result = await flaresolverRoute(data, client_ip, db)
+        result = await flaresolverRoute(data, client_ip, db, submitted_at, task_cancel_events.get(task_id), lambda: mark_task_started(task_id))
+        # Once solved, large pages move to the body store as bytes and are served by /v1/tasks/{id}/body instead of inside the JSON
+        stream_body = isTruthy(data["streamBody"]) if data.get("streamBody") is not None else None
+        result = spoolResult(task_id, result, stream_body)
+        final_status = "cancelled" if result.get("status") == "cancelled" else "completed"
         task_results[task_id] = result
-        task_status[task_id] = "completed"
+        task_status[task_id] = final_status
     except Exception as e:
-        print(e)
+        logger.exception("Task failed")
         task_results[task_id] = {"error": str(e)}
-        task_status[task_id] = "failed"
+        task_status[task_id] = final_status
+    finally:
+        task_cancel_events.pop(task_id, None)
+        if future is not None and not future.done():
+            future.set_result(final_status)
+
+def mark_task_started(task_id: str):
+    # Queued tasks are the ones a drain cancels right away
+    if task_status.get(task_id) == "queued":
+        task_status[task_id] = "processing"
+
+def forget_task(task_id: str):
+    task_status.pop(task_id, None)
+    task_results.pop(task_id, None)
+    task_futures.pop(task_id, None)
+    bodyStore.drop(task_id)
+
+def forget_when_done(task_id: str):
+    # The synchronous caller gave up on the task, nobody will fetch its result
+    future = task_futures.get(task_id)
+    if future is not None:
+        future.add_done_callback(lambda _: forget_task(task_id))
+
+def cancel_task(task_id: str) -> bool:
+    cancel_event = task_cancel_events.get(task_id)
+    if cancel_event is None:
+        return False
+    logger.info("Cancelling task %s", task_id)
+    cancel_event.set()
+    return True
+
+async def wait_for_tasks(seconds: float):
+    give_up_at = time.monotonic() + seconds
+    while task_cancel_events and time.monotonic() < give_up_at:
+        await asyncio.sleep(DRAIN_POLL_INTERVAL)
+
+async def drain_tasks() -> Dict[str, int]:
+    """Let running tasks finish within the grace period, cancel the rest.
+
+    Tasks still waiting for a slot are cancelled at once, they would not get
+    one before the grace period ends anyway. Cancelled tasks stop at their
+    next boundary and quit their own browser.
+    """
+    queued = [task_id for task_id in list(task_cancel_events) if task_status.get(task_id) == "queued"]
+    for task_id in queued:
+        cancel_task(task_id)
+    logger.info("Draining %s running tasks, cancelled %s queued ones", len(task_cancel_events) - len(queued), len(queued))
+    await wait_for_tasks(SHUTDOWN_GRACE_SECONDS)
+    running = list(task_cancel_events)
+    for task_id in running:
+        cancel_task(task_id)
+    await wait_for_tasks(SHUTDOWN_CANCEL_SECONDS)
+    # Async engine tasks stuck outside a boundary; threads cannot be interrupted and are left to the process exit
+    for task in list(running_tasks):
+        task.cancel()
+    abandoned = len(task_cancel_events)
+    if abandoned:
+        logger.warning("%s tasks did not stop within the shutdown grace period", abandoned)
+    return {"queued": len(queued), "cancelled": len(running), "abandoned": abandoned}
+
+async def process_flaresolver_request_in_background(task_id: str, data: Dict[str, Any], client_ip: str, submitted_at: float = None):
+    async with get_db_for_background() as db:
+        await process_flaresolver_request(task_id, data, client_ip, db, submitted_at)
 
 # Session manager for background tasks
 @asynccontextmanager
@@ -122,23 +223,98 @@ async def flaresolver(
     request: Request, 
     # background_tasks: BackgroundTasks,
     data: Dict[str, Any] = Body(...),  
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    sync: Optional[bool] = None
 ):
+    if lifecycle.draining:
+        response = compressedJsonResponse(request, {
+            "status": "error",
+            "error": "Server is shutting down",
+            "message": "Server is shutting down",
+        }, status_code=503)
+        response.headers["Retry-After"] = str(lifecycle.retryAfter())
+        return response
+    # Checked before the task exists, a bad value would otherwise only fail once it runs
+    try:
+        max_timeout = int(data.get("maxTimeout", 60))
+    except (TypeError, ValueError):
+        max_timeout = 0
+    try:
+        cache_max_age = int(data.get("cacheMaxAge", 0))
+    except (TypeError, ValueError):
+        cache_max_age = -1
+    invalid = None
+    if max_timeout <= 0:
+        invalid = "maxTimeout must be a positive integer"
+    elif cache_max_age < 0:
+        invalid = "cacheMaxAge must be a non-negative integer"
+    if invalid:
+        return compressedJsonResponse(request, {
+            "status": "error",
+            "error": invalid,
+            "message": invalid,
+        }, status_code=400)
+    submitted_at = time.monotonic()
     task_id = str(uuid.uuid4())
     task_status[task_id] = "queued"
+    task_futures[task_id] = concurrent.futures.Future()
+    task_cancel_events[task_id] = threading.Event()
     
-    threading.Thread(
-        target=asyncio.run,
-        args=(process_flaresolver_request(task_id, data, request.client.host, db),)
-    ).start()
+    if engineRunsOnEventLoop():
+        # Async engine: multiplex the task on the application loop with its own DB session
+        task = asyncio.create_task(process_flaresolver_request_in_background(task_id, data, request.client.host, submitted_at))
+        running_tasks.add(task)
+        task.add_done_callback(running_tasks.discard)
+    else:
+        threading.Thread(
+            target=asyncio.run,
+            args=(process_flaresolver_request(task_id, data, request.client.host, db, submitted_at),)
+        ).start()
+    if sync is None:
+        sync = isTruthy(data.get("sync", os.getenv("V1_SYNC_DEFAULT", "false")))
+    if sync:
+        return await wait_for_task_result(request, task_id, max_timeout)
     return {
         "task_id": task_id,
         "status": "queued",
         "message": "Your request is being processed in the background"
     }
 
+async def wait_for_task_result(request: Request, task_id: str, max_timeout: int):
+    # FlareSolverr-compatible synchronous mode: hold the connection and answer inline
+    future = asyncio.wrap_future(task_futures[task_id])
+    give_up_at = time.monotonic() + max_timeout + SYNC_GRACE_SECONDS
+    while not future.done():
+        if await request.is_disconnected():
+            # Nobody is left to read the solution, free the browser for other work
+            cancel_task(task_id)
+            forget_when_done(task_id)
+            return Response(status_code=499)
+        if time.monotonic() >= give_up_at:
+            forget_when_done(task_id)
+            return compressedJsonResponse(request, {
+                "task_id": task_id,
+                "status": "timeout",
+                "message": f"Timeout after {max_timeout}s, the task is still {task_status.get(task_id)}",
+            }, status_code=500)
+        await asyncio.wait({future}, timeout=SYNC_DISCONNECT_CHECK_INTERVAL)
+    task_status.pop(task_id, None)
+    result = task_results.pop(task_id, {"error": "Result not found"})
+    task_futures.pop(task_id, None)
+    if "error" in result:
+        result.setdefault("status", "error")
+        result.setdefault("message", result["error"])
+        if "retryAfter" in result:
+            # Over the user's quota, not a failure of the request itself
+            response = compressedJsonResponse(request, result, status_code=429)
+            response.headers["Retry-After"] = str(max(1, int(result["retryAfter"] + 0.5)))
+            return response
+        return compressedJsonResponse(request, result, status_code=500)
+    return compressedJsonResponse(request, result)
+
 @router.get("/v1/tasks/{task_id}")
 async def get_task_status(
+    request: Request,
     task_id: str, 
     wait: bool = False, 
     timeout: int = 30,
@@ -149,34 +325,29 @@ async def get_task_status(
     
     status = task_status[task_id]
     
-    # If wait=True and task is still processing, poll until completion or timeout
-    if wait and status in ["queued", "processing"]:
-        start_time = time.time()
-        while status in ["queued", "processing"] and (time.time() - start_time) < timeout:
-            # Wait for a short interval before checking again
-            await asyncio.sleep(polling_interval)
-            
-            # Check if task still exists
-            if task_id not in task_status:
-                raise HTTPException(status_code=404, detail="Task not found")
-            
-            # Update status
-            status = task_status[task_id]
-    print(status)
-    # Return result if task is completed/failed
-    if status == "completed" or status == "failed":
+    # If wait=True and task is still processing, hold the request until it settles or timeout
+    # (polling_interval is accepted for older clients, completion now wakes the request directly)
+    future = task_futures.get(task_id)
+    if wait and status in ["queued", "processing"] and future is not None:
+        await asyncio.wait({asyncio.wrap_future(future)}, timeout=min(timeout, LONG_POLL_MAX_SECONDS))
+        if task_id not in task_status:
+            raise HTTPException(status_code=404, detail="Task not found")
+        status = task_status[task_id]
+    # Return result if task is completed/failed/cancelled
+    if status in ["completed", "failed", "cancelled"]:
         result = task_results.get(task_id, {"error": "Result not found"})
         
         # Optionally clean up completed tasks after retrieval
         if task_id in task_results:
             del task_results[task_id]
             del task_status[task_id]
+            task_futures.pop(task_id, None)
             
-        return {
+        return compressedJsonResponse(request, {
             "task_id": task_id,
             "status": status,
             "result": result
-        }
+        })
     
     # If still processing after wait timeout, return current status
     return {
@@ -184,6 +355,162 @@ async def get_task_status(
         "status": status
     }
 
+@router.get("/v1/tasks/{task_id}/body")
+async def get_task_body(request: Request, task_id: str):
+    opened = bodyStore.open(task_id)
+    if opened is None:
+        raise HTTPException(status_code=404, detail="Body not found or expired")
+    body, release = opened
+    # The stream releases the body when it ends, the background task when it never started
+    background = BackgroundTask(release)
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{task_id}-{body.size}"', "Vary": "Accept-Encoding"}
+    try:
+        byte_range = parseRange(request.headers.get("range"), body.size)
+    except RangeNotSatisfiable as e:
+        release()
+        return Response(status_code=416, headers={"Content-Range": str(e)})
+    if byte_range is not None:
+        # Ranges address the identity bytes, so partial responses are never compressed
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{body.size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(body.read(start, end, release), status_code=206, media_type=body.content_type, headers=headers, background=background)
+    encoding = acceptedEncoding(request) if body.size >= MIN_COMPRESS_SIZE else None
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        # A different representation, caches must not answer a range request with it
+        headers["ETag"] = f'"{task_id}-{body.size}-{encoding}"'
+        return StreamingResponse(body.compressed(encoding, release), media_type=body.content_type, headers=headers, background=background)
+    headers["Content-Length"] = str(body.size)
+    return StreamingResponse(body.read(0, body.size - 1, release), media_type=body.content_type, headers=headers, background=background)
+
+@router.delete("/v1/tasks/{task_id}/body")
+async def delete_task_body(task_id: str):
+    if not bodyStore.drop(task_id):
+        raise HTTPException(status_code=404, detail="Body not found or expired")
+    return {"task_id": task_id, "status": "deleted"}
+
+@router.get("/throttle/")
+async def get_throttle_stats(current_user: models.User = Depends(get_current_admin)):
+    return {"domains": domainThrottle.stats()}
+
+@router.delete("/v1/tasks/{task_id}")
+async def delete_task(task_id: str):
+    if task_id not in task_status:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not cancel_task(task_id):
+        raise HTTPException(status_code=409, detail=f"Task already {task_status[task_id]}")
+    return {
+        "task_id": task_id,
+        "status": "cancelling",
+        "message": "The task will stop at its next navigation, wait or action"
+    }
+
+@router.get("/admin/scheduler")
+async def get_scheduler_stats(current_user: models.User = Depends(get_current_admin)):
+    return fairScheduler.stats()
+
+@router.put("/admin/quotas/{user_id}")
+async def update_user_quota(
+    user_id: int,
+    quota: schemas.UserQuotaUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_admin)
+):
+    user = await db.execute(select(models.User).where(models.User.id == user_id))
+    if user.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        updated = await setQuota(db, user_id, quota.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"user_id": user_id, **updated.to_dict()}
+
+@router.get("/admin/profiles")
+async def get_domain_profiles(
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_admin)
+):
+    return {"profiles": await listProfiles(db)}
+
+@router.get("/admin/profiles/{domain}")
+async def get_domain_profile(
+    domain: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_admin)
+):
+    stats = await loadDomain(db, domain.lower())
+    if stats is None or stats.samples == 0:
+        raise HTTPException(status_code=404, detail="No profile for this domain")
+    return stats.to_dict()
+
+@router.delete("/admin/profiles/{domain}")
+async def delete_domain_profile(
+    domain: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_admin)
+):
+    if not await resetProfile(db, domain.lower()):
+        raise HTTPException(status_code=404, detail="No profile for this domain")
+    return {"domain": domain.lower(), "status": "reset"}
+
+@router.get("/admin/logging")
+async def get_logging(current_user: models.User = Depends(get_current_admin)):
+    return getLoggingConfig()
+
+@router.put("/admin/logging")
+async def update_logging(
+    settings: schemas.LoggingSettings,
+    current_user: models.User = Depends(get_current_admin)
+):
+    try:
+        if settings.level:
+            setLogLevel(settings.level, settings.logger)
+        for level, rate in (settings.sampling or {}).items():
+            setSamplingRate(level, rate)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return getLoggingConfig()
+
+@router.post("/admin/drain")
+async def start_drain(current_user: models.User = Depends(get_current_admin)):
+    # New work is refused from now on, running tasks carry on until the process is stopped
+    lifecycle.beginDrain()
+    return {**lifecycle.status(), "tasks": len(task_cancel_events)}
+
+@router.get("/admin/startup")
+async def get_startup_report(current_user: models.User = Depends(get_current_admin)):
+    return startupTimer.report()
+
+@router.get("/retention/policy", response_model=schemas.RetentionPolicy)
+async def get_retention_policy(
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    policy = await getPolicy(db, current_user.id)
+    values = {field: getattr(policy, field, None) for field in POLICY_FIELDS}
+    return {**values, "user_id": current_user.id, "effective": effectivePolicy(policy)}
+
+@router.put("/retention/policy", response_model=schemas.RetentionPolicy)
+async def update_retention_policy(
+    settings: schemas.RetentionPolicyUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    try:
+        policy = await setPolicy(db, current_user.id, settings.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    values = {field: getattr(policy, field) for field in POLICY_FIELDS}
+    return {**values, "user_id": current_user.id, "effective": effectivePolicy(policy)}
+
+@router.post("/admin/retention", response_model=schemas.RetentionReport)
+async def run_retention(current_user: models.User = Depends(get_current_admin)):
+    report = await runRetention()
+    if report is None:
+        raise HTTPException(status_code=409, detail="A retention run is already in progress")
+    return report
+
 @router.post("/allowed-hosts/", response_model=schemas.AllowedOrigin)
 async def create_host(
     origin: schemas.AllowedOriginCreate, 
@@ -215,6 +542,47 @@ async def get_user_requests(
     result = await db.execute(select(models.Request).where(models.Request.user_id == current_user.id))
     return result.scalars().all()
 
+@router.get("/requests/export")
+async def export_user_requests(
+    request: Request,
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status_code: Optional[List[int]] = Query(None),
+    url: Optional[str] = None,
+    include_body: bool = False,
+    current_user: models.User = Depends(get_current_user)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {
+        "Content-Disposition": f'attachment; filename="requests.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    stream = exportRequests(current_user.id, format, since, until, status_code, url, include_body, compress)
+    return StreamingResponse(stream, media_type=media_type, headers=headers)
+
+@router.get("/requests/search", response_model=List[schemas.SearchResult])
+async def search_user_requests(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    raw: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    try:
+        return await searchRequests(db, current_user.id, q, limit, offset, raw)
+    except OperationalError as e:
+        # Malformed FTS5 syntax in a raw query
+        raise HTTPException(status_code=400, detail=str(e.orig))
+
 @router.get("/screenshots/{request_id}", response_class=FileResponse)
 async def get_request_screenshot(
     request_id: int,
@@ -254,6 +622,60 @@ async def get_request_screenshot(
     
     return FileResponse(screenshot_path)
 
+@router.get("/cookie-jars/", response_model=List[schemas.CookieJarSummary])
+async def list_cookie_jars(
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    return await listCookieJars(db, current_user.id)
+
+@router.get("/cookie-jars/{name}", response_model=schemas.CookieJar)
+async def get_cookie_jar(
+    name: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    jar = await getCookieJar(db, current_user.id, name)
+    if jar is None:
+        raise HTTPException(status_code=404, detail="Cookie jar not found")
+    return {"name": name, "cookies": jarCookies(jar)}
+
+@router.put("/cookie-jars/{name}", response_model=schemas.CookieJar)
+async def put_cookie_jar(
+    name: str,
+    cookies: List[Dict[str, Any]] = Body(...),
+    replace: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if not validJarName(name):
+        raise HTTPException(status_code=400, detail="Invalid cookie jar name")
+    try:
+        stored = await storeCookieJar(db, current_user.id, name, cookies, replace=replace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CookieJarBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"name": name, "cookies": stored}
+
+@router.delete("/cookie-jars/{name}")
+async def delete_cookie_jar(
+    name: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if not await deleteCookieJar(db, current_user.id, name):
+        raise HTTPException(status_code=404, detail="Cookie jar not found")
+    return {"message": "Cookie jar deleted"}
+
+@router.get("/chrome-sessions/stats")
+async def get_user_chrome_session_stats(
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    result = await db.execute(select(models.ChromeSession.session_id).where(models.ChromeSession.user_id == current_user.id))
+    return sessionStats(set(result.scalars().all()))
+
 @router.get("/chrome-sessions/", response_model=List[schemas.ChromeSession])
 async def get_user_chrome_sessions(
     db: AsyncSession = Depends(get_db),
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -61,6 +61,53 @@ class Request(RequestBase):
     class Config:
         from_attributes = True
 
+class SearchResult(BaseModel):
+    id: int
+    url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    status_code: Optional[int] = None
+    rank: float
+    snippet: str
+
+class CookieJarSummary(BaseModel):
+    name: str
+    cookies: int
+    updated_at: Optional[datetime] = None
+
+class CookieJar(BaseModel):
+    name: str
+    cookies: List[Dict[str, Any]]
+
+class UserQuotaUpdate(BaseModel):
+    max_concurrent: Optional[int] = None
+    max_queued: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    weight: Optional[float] = None
+
+class RetentionPolicyBase(BaseModel):
+    max_age_days: Optional[int] = None
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+class RetentionPolicyUpdate(RetentionPolicyBase):
+    pass
+
+class RetentionPolicy(RetentionPolicyBase):
+    user_id: int
+    # What is enforced once the global defaults are applied
+    effective: RetentionPolicyBase
+
+class RetentionReport(BaseModel):
+    users: int
+    deleted_rows: int
+    deleted_screenshots: int
+    orphan_screenshots: int
+    screenshot_bytes: int
+    database_bytes_before: int
+    database_bytes_after: int
+    reclaimed_bytes: int
+    duration_ms: float
+
 class ChromeSessionBase(BaseModel):
     session_id: str
     proxy: Optional[str] = None
@@ -79,6 +126,26 @@ class BrowserAction(BaseModel):
     value: Optional[str] = None
     selector: Optional[str] = None
 
+class ExtractField(BaseModel):
+    selector: Optional[str] = None
+    xpath: Optional[str] = None
+    type: str = "text"
+    attribute: Optional[str] = None
+    multiple: bool = False
+
+class CaptureOptions(BaseModel):
+    urlPattern: Optional[str] = None
+    types: Optional[List[str]] = None
+    bodies: bool = False
+    maxEntries: int = 200
+    maxBodySize: int = 1024 * 1024
+    format: str = "har"
+
+class LoggingSettings(BaseModel):
+    level: Optional[str] = None
+    logger: Optional[str] = None
+    sampling: Optional[Dict[str, float]] = None
+
 class TaskStatus(BaseModel):
     task_id: str
     status: str
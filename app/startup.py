@@ -0,0 +1,71 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Modules that make startup slow when imported eagerly, reported as loaded or not
+HEAVY_MODULES = ("seleniumbase", "nodriver", "mycdp", "cdp", "httpx", "h2", "aiohttp", "yaml")
+
+
+class StartupTimer:
+    """Records how long the process spent importing modules and in each lifespan phase.
+
+    Timestamps are relative to the moment this module was first imported,
+    which main.py does before anything else.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.imports: List[Dict[str, Any]] = []
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return round((time.perf_counter() - self.origin) * 1000, 1)
+
+    @contextmanager
+    def measure(self, records: List[Dict[str, Any]], name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {
+                "name": name,
+                "startMs": round((start - self.origin) * 1000, 1),
+                "durationMs": round((time.perf_counter() - start) * 1000, 1),
+            }
+            with self.lock:
+                records.append(entry)
+
+    def importing(self, name: str):
+        # Only the first import is recorded, later ones are dict lookups in sys.modules
+        if name in sys.modules:
+            return _noop()
+        return self.measure(self.imports, name)
+
+    def phase(self, name: str):
+        return self.measure(self.phases, name)
+
+    def markReady(self):
+        self.ready_at = self.elapsed()
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            imports = sorted(self.imports, key=lambda entry: entry["durationMs"], reverse=True)
+            phases = list(self.phases)
+        return {
+            "readyMs": self.ready_at,
+            "imports": imports,
+            "phases": phases,
+            "heavyModulesLoaded": {name: name in sys.modules for name in HEAVY_MODULES},
+        }
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+startupTimer = StartupTimer()
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from typing import Dict, Optional
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from starlette.exceptions import HTTPException
+from app.api.responses import MIN_COMPRESS_SIZE, acceptedEncoding, brotli
+
+logger = logging.getLogger(__name__)
+
+# Vite names build output like assets/index-CGjdyEN2.js, the hash changes with the content
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else (index.html, vite.svg) is revalidated with its ETag on each use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+# Files above this size are served from disk instead of being held in memory
+MAX_CACHED_FILE_SIZE = int(os.getenv("STATIC_MAX_CACHED_FILE_SIZE", str(5 * 1024 * 1024)))
+
+
+class StaticAsset:
+    def __init__(self, path: str, name: str, body: bytes):
+        self.path = path
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(name) else REVALIDATE_CACHE_CONTROL
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        # One representation per content-coding, each with its own strong ETag
+        self.variants: Dict[Optional[str], bytes] = {None: body}
+        self.etags: Dict[Optional[str], str] = {None: f'"{digest}"'}
+        if len(body) >= MIN_COMPRESS_SIZE and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            self.variants["gzip"] = readSibling(path + ".gz") or gzip.compress(body, compresslevel=9)
+            self.etags["gzip"] = f'"{digest}-gzip"'
+            if brotli is not None:
+                self.variants["br"] = readSibling(path + ".br") or brotli.compress(body, quality=11)
+                self.etags["br"] = f'"{digest}-br"'
+
+    def matches(self, if_none_match: str) -> bool:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not tags.isdisjoint(self.etags.values())
+
+
+def readSibling(path: str) -> Optional[bytes]:
+    # Precompressed files written by the frontend build are used as is
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+class CachedStaticFiles:
+    """Serves the dashboard build from memory.
+
+    Every file is read once at startup and compressible ones are gzip and
+    brotli encoded up front, so a page view costs no disk read and no
+    compression. Hashed assets are sent as immutable, everything else is
+    revalidated with If-None-Match and answered with 304 when unchanged.
+    Unknown paths get index.html so client-side routes survive a reload.
+    """
+
+    def __init__(self, directory: str, fallback: str = "index.html"):
+        self.directory = os.path.realpath(directory)
+        self.fallback = fallback
+        self.assets: Dict[str, StaticAsset] = {}
+        self.load()
+
+    def load(self):
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith((".gz", ".br")):
+                    continue
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if os.path.getsize(path) > MAX_CACHED_FILE_SIZE:
+                    continue
+                with open(path, "rb") as f:
+                    assets[name] = StaticAsset(path, name, f.read())
+        self.assets = assets
+        logger.info("Loaded static files", extra={"directory": self.directory, "files": len(assets)})
+
+    def index(self) -> Optional[StaticAsset]:
+        return self.assets.get(self.fallback)
+
+    def fileName(self, path: str) -> str:
+        name = path.lstrip("/")
+        if name == "" or name.endswith("/"):
+            name += "index.html"
+        return name
+
+    def diskPath(self, name: str) -> Optional[str]:
+        path = os.path.realpath(os.path.join(self.directory, name))
+        if path.startswith(self.directory + os.sep) and os.path.isfile(path):
+            return path
+        return None
+
+    def response(self, request: Request, asset: StaticAsset) -> Response:
+        encoding = acceptedEncoding(request)
+        if encoding not in asset.variants:
+            encoding = None
+        headers = {"ETag": asset.etags[encoding], "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if asset.matches(request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        body = asset.variants[encoding] if request.method != "HEAD" else b""
+        response = Response(content=body, media_type=asset.media_type, headers=headers)
+        if request.method == "HEAD":
+            response.headers["Content-Length"] = str(len(asset.variants[encoding]))
+        return response
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if request.method not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        name = self.fileName(path)
+        asset = self.assets.get(name)
+        if asset is None and self.diskPath(name):
+            # Too large to be cached
+            response = FileResponse(self.diskPath(name), headers={"Cache-Control": REVALIDATE_CACHE_CONTROL})
+            await response(scope, receive, send)
+            return
+        if asset is None:
+            # API paths keep their JSON 404, anything else is a dashboard route
+            if path.startswith("/api/") or self.index() is None:
+                raise HTTPException(status_code=404)
+            asset = self.index()
+        await self.response(request, asset)(scope, receive, send)
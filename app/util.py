@@ -2,4 +2,16 @@ def verifyStringIsProxy(ip: str) -> bool:
     # Check if the string is a valid proxy format (e.g., "proxy://ip:port")
     if ip.startswith("proxy://"):
         return True
-    return False
\ No newline at end of file
+    return False
+
+def isTruthy(value) -> bool:
+    # Accept both JSON booleans and the "true"/"false" strings used by the v1 API
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+def proxyServer(proxy):
+    # "proxy://ip:port" -> "ip:port", the form Chrome's --proxy-server expects
+    if not proxy:
+        return None
+    return proxy[len("proxy://"):] if proxy.startswith("proxy://") else proxy
@@ -0,0 +1,191 @@
+"""Compare browser engines on throughput per core.
+
+Loads every URL with a fresh browser, the way a session-less request.get
+does, with the given concurrency, and reports pages per second, pages
+per CPU-second (this process plus reaped Chrome children) and the latency
+of each solve, up to the clearance of any challenge.
+
+    python bench_engines.py --engine seleniumbase --engine nodriver \\
+        --concurrency 4 --repeat 3 https://example.com
+
+Live sites change between runs. To compare configurations on the same
+solve, record it once into an archive, then replay the archive offline as
+often as needed: every request of the page is answered from the archive
+through CDP Fetch interception, after the delay it took when recorded.
+
+    python bench_engines.py --record solve.har.gz https://example.com
+    python bench_engines.py --replay solve.har.gz --engine nodriver --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def cpu_seconds() -> float:
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def solve_plan(settle: float):
+    from app.api.profiles import PROFILE_MAX_WAIT, SolvePlan
+    return SolvePlan("browser", None, settle, PROFILE_MAX_WAIT, "bench")
+
+
+async def load_page(engine_class, url: str, settle: float, archive=None, speed: float = 1.0) -> dict:
+    from app.api.deadline import Deadline
+    from app.api.flaresolver import waitForClearance
+    from app.api.replay import Replayer
+    page = await engine_class.launch()
+    replayer = None
+    try:
+        await page.activate()
+        if archive is not None:
+            # A fresh replayer per page, repeated requests consume the archive in order
+            replayer = Replayer(archive, speed)
+            await replayer.attach(page)
+        started = time.monotonic()
+        await page.open(url)
+        challenged, cleared_after = await waitForClearance(page, Deadline(120), solve_plan(settle))
+        result = {
+            "size": len(await page.get_content()),
+            "seconds": time.monotonic() - started,
+            "challenged": challenged,
+            "cleared": not challenged or cleared_after is not None,
+        }
+        if replayer is not None:
+            result.update(replayer.stats())
+            await replayer.detach(page)
+        return result
+    finally:
+        await page.quit()
+
+
+def run_threaded(engine_class, urls, concurrency, **options):
+    # Mirrors the seleniumbase path of routes.flaresolver: one thread and event loop per request
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda url: asyncio.run(load_page(engine_class, url, **options)), urls))
+
+
+async def run_on_loop(engine_class, urls, concurrency, **options):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(url):
+        async with semaphore:
+            return await load_page(engine_class, url, **options)
+
+    return await asyncio.gather(*(bounded(url) for url in urls))
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 3)
+
+
+def load_engine(engine: str):
+    os.environ["BROWSER_ENGINE"] = engine
+    from app.browser_manager.manager import engineClass
+    engine_class = engineClass()
+    if not engine_class.runs_on_event_loop:
+        import nest_asyncio
+        nest_asyncio.apply()
+    return engine_class
+
+
+def bench(engine: str, urls, concurrency: int, **options) -> dict:
+    engine_class = load_engine(engine)
+    cpu_before = cpu_seconds()
+    wall_before = time.monotonic()
+    if engine_class.runs_on_event_loop:
+        pages = asyncio.run(run_on_loop(engine_class, urls, concurrency, **options))
+    else:
+        pages = run_threaded(engine_class, urls, concurrency, **options)
+    wall = time.monotonic() - wall_before
+    cpu = cpu_seconds() - cpu_before
+    latencies = [page["seconds"] for page in pages]
+    report = {
+        "engine": engine,
+        "pages": len(pages),
+        "bytes": sum(page["size"] for page in pages),
+        "wall_seconds": round(wall, 2),
+        "cpu_seconds": round(cpu, 2),
+        "pages_per_second": round(len(pages) / wall, 3),
+        "pages_per_cpu_second": round(len(pages) / cpu, 3) if cpu else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "uncleared": sum(1 for page in pages if not page["cleared"]),
+    }
+    if options.get("archive") is not None:
+        report["replay_served"] = sum(page["served"] for page in pages)
+        report["replay_misses"] = sum(page["misses"] for page in pages)
+    return report
+
+
+async def record_page(engine_class, url: str, path: str, settle: float):
+    from app.api.deadline import Deadline
+    from app.api.flaresolver import waitForClearance
+    from app.api.replay import buildArchive, newRecorder, writeArchive
+    page = await engine_class.launch()
+    try:
+        await page.activate()
+        recorder = newRecorder(page.network)
+        recorder.attach(page)
+        deadline = Deadline(180)
+        await page.open(url)
+        challenged, cleared_after = await waitForClearance(page, deadline, solve_plan(settle))
+        await recorder.fetch_bodies(page, deadline)
+        recorder.detach(page)
+        writeArchive(path, buildArchive(recorder, url, await page.get_cookies(), engine_class.__name__))
+        return {"url": url, "archive": path, "entries": len(recorder.entries), "challenged": challenged, "cleared_after": cleared_after}
+    finally:
+        await page.quit()
+
+
+def record(engine: str, url: str, path: str, settle: float) -> dict:
+    engine_class = load_engine(engine)
+    return asyncio.run(record_page(engine_class, url, path, settle))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("urls", nargs="*")
+    parser.add_argument("--engine", action="append", choices=["seleniumbase", "nodriver"])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--settle", type=float, default=0.0, help="seconds on the page before looking for a challenge")
+    parser.add_argument("--record", metavar="ARCHIVE", help="record the solve of the URL into ARCHIVE (.har or .har.gz)")
+    parser.add_argument("--replay", metavar="ARCHIVE", help="replay ARCHIVE offline instead of loading live URLs")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay delay factor, 0 answers every request at once")
+    args = parser.parse_args()
+    engines = args.engine or ["seleniumbase", "nodriver"]
+    if args.record:
+        if len(args.urls) != 1:
+            parser.error("--record takes exactly one URL")
+        # Recording waits like a real solve so the challenge and its clearance are in the archive
+        print(record(engines[0], args.urls[0], args.record, args.settle or 6.0))
+        return
+    options = {"settle": args.settle}
+    if args.replay:
+        from app.api.replay import Replayer, readArchive
+        archive = readArchive(args.replay)
+        options.update(archive=archive, speed=args.speed)
+        urls = [Replayer(archive).url] * args.repeat
+    elif args.urls:
+        urls = args.urls * args.repeat
+    else:
+        parser.error("give URLs to load, or --replay an archive")
+    for engine in engines:
+        print(bench(engine, urls, args.concurrency, **options))
+
+
+if __name__ == "__main__":
+    main()
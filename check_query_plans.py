@@ -0,0 +1,98 @@
+"""Check that the migrations build the models' schema and the hot queries use indexes.
+
+Runs every migration on an empty SQLite database, compares the result with
+app.models, then asks SQLite for the plan of the history, export, retention,
+session and allowed-host queries, built by the same functions the API uses.
+Exits non-zero when a migration is missing or a query would scan its table
+or sort its rows in a temporary B-tree.
+
+    python check_query_plans.py
+"""
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import sqlite
+
+from app.database import Base, alembic_config
+from app.models import AllowedOrigin, ChromeSession, Request
+from app.api.export import exportQuery
+from app.api.retention import expiredQuery
+
+NOW = datetime.datetime(2026, 1, 1)
+
+
+def hotQueries():
+    """(name, query, index the plan must use) for every hot path."""
+    retention = {"max_age_days": 30, "max_rows": 1000, "max_bytes": None}
+    by_age, by_rows = expiredQuery(1, retention)
+    return [
+        ("history", select(Request).where(Request.user_id == 1), "ix_requests_user_id_created_at"),
+        ("export range", exportQuery(1, NOW - datetime.timedelta(days=7), NOW, None, None, False), "ix_requests_user_id_created_at"),
+        ("retention by age", by_age, "ix_requests_user_id_created_at"),
+        ("retention by rows", by_rows, "ix_requests_user_id_created_at"),
+        ("session requests", select(Request.id).where(Request.chrome_session_id == 1), "ix_requests_chrome_session_id"),
+        ("sessions.list", select(ChromeSession).where(ChromeSession.user_id == 1), "ix_chrome_sessions_user_id"),
+        ("allowed hosts", select(AllowedOrigin).where(AllowedOrigin.owner_id == 1), "ix_allowed_origins_owner_id"),
+    ]
+
+
+def queryPlan(connection: sqlite3.Connection, query) -> list:
+    compiled = query.compile(dialect=sqlite.dialect())
+    params = [compiled.params[name] for name in compiled.positiontup]
+    params = [value.isoformat(" ") if isinstance(value, datetime.datetime) else value for value in params]
+    return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+def managedName(name, type_, parent_names) -> bool:
+    # The full-text tables are created by hand and unknown to the models
+    return type_ != "table" or not name.startswith("request_search")
+
+
+def schemaDifferences(path: str) -> list:
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_name": managedName})
+        differences = compare_metadata(context, Base.metadata)
+    engine.dispose()
+    return differences
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "check.db")
+        config = alembic_config()
+        config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+        command.upgrade(config, "head")
+
+        differences = schemaDifferences(path)
+        for diff in differences:
+            print(f"FAIL schema: migrations and models differ: {diff}")
+        failures += len(differences)
+
+        connection = sqlite3.connect(path)
+        for name, query, index in hotQueries():
+            plan = queryPlan(connection, query)
+            scans = [step for step in plan if step.startswith("SCAN") and "USING" not in step]
+            # An index that does not give the query's order still sorts every matching row
+            sorts = [step for step in plan if "USE TEMP B-TREE" in step]
+            ok = any(index in step for step in plan) and not scans and not sorts
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {' | '.join(plan)}")
+            failures += not ok
+        connection.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,22 @@
-import requests
-import json
+import asyncio
+import sys
+from cloudscrapper_client import AsyncClient
 
 # Configuration
-API_URL = "http://127.0.0.1:8000/proxy"
-TOKEN = "votre_token_jwt_ici"  # Obtenu après connexion avec /login
+API_URL = "http://127.0.0.1:8000"
+TOKEN = None  # Only needed for /api/requests and the other user endpoints, /api/v1 is authorized by IP
 
-headers = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
+URLS = sys.argv[1:] or ["https://example.com"]
 
-# Données de la requête proxy
-proxy_data = {
-    "target_url": "https://example.com",
-    "method": "GET",
-    "headers": {
-        "Accept": "text/html,application/xhtml+xml,application/xml",
-        "Accept-Language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7"
-    }
-}
 
-# Envoi de la requête au proxy
-response = requests.post(API_URL, headers=headers, json=proxy_data)
+async def main():
+    async with AsyncClient(API_URL, token=TOKEN, max_concurrency=8) as client:
+        async for result in client.map(URLS, maxTimeout=60):
+            if result.ok:
+                print(f"{result.url}: {result.solution.status} ({len(result.solution.response or '')} bytes)")
+            else:
+                print(f"{result.url}: {result.status} - {result.error}")
 
-# Affichage des résultats
-if response.status_code == 200:
-    proxy_response = response.json()
-    print(f"Status Code: {proxy_response['status_code']}")
-    print(f"Headers: {json.dumps(proxy_response['headers'], indent=2)}")
-    print(f"Content: {proxy_response['content'][:200]}...")  # Affiche les 200 premiers caractères
-else:
-    print(f"Erreur: {response.status_code}")
-    print(response.text)
+
+if __name__ == "__main__":
+    asyncio.run(main())
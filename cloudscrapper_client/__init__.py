@@ -0,0 +1,7 @@
+"""Python client for the cloudscrapper /api/v1 protocol."""
+
+from cloudscrapper_client.client import AsyncClient
+from cloudscrapper_client.models import CloudScrapperError, Solution, TaskResult
+from cloudscrapper_client.sync import Client
+
+__all__ = ["AsyncClient", "Client", "CloudScrapperError", "Solution", "TaskResult"]
@@ -0,0 +1,204 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+import httpx
+from cloudscrapper_client.models import CloudScrapperError, TaskResult
+
+# A plain 500 is the task's own failure, reported in the body and not worth repeating
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# Longest single long-poll, the server caps it at 120 seconds
+LONG_POLL_SECONDS = 30
+FINAL_TASK_STATUSES = ("completed", "failed", "cancelled")
+
+
+class AsyncClient:
+    """Async client for the /api/v1 protocol.
+
+    One pooled keep-alive connection set is shared by every call. Work is
+    submitted in the background and collected with long-polls, so waiting on
+    thousands of pages costs one open request each rather than a poll loop.
+    `max_concurrency` bounds the tasks in flight in `map` and `get_many`.
+
+        async with AsyncClient("http://localhost:8000") as client:
+            async for result in client.map(urls, maxTimeout=60):
+                ...
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: Optional[str] = None,
+        max_concurrency: int = 8,
+        retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 30.0,
+        http2: bool = False,
+    ):
+        headers = {"Accept-Encoding": "gzip"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            http2=http2,
+            # Long-polls hold a connection each, keep enough of them alive for full concurrency
+            limits=httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_concurrency * 2),
+            timeout=httpx.Timeout(timeout, read=LONG_POLL_SECONDS + timeout),
+        )
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.http.aclose()
+
+    def retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return float(response.headers["Retry-After"])
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        # Full jitter keeps a fleet of clients from retrying in lockstep
+        return random.uniform(0, delay)
+
+    async def call(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transport errors, 429 and 5xx with backoff."""
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = await self.http.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except httpx.TransportError as e:
+                error = f"{e.__class__.__name__}: {e}"
+            if attempt == self.retries:
+                raise CloudScrapperError(f"{method} {path} failed after {attempt + 1} attempts: {error}", response.status_code if response is not None else None)
+            await asyncio.sleep(self.retry_delay(attempt, response))
+
+    async def login(self, email: str, password: str) -> str:
+        response = await self.call("POST", "/api/login", json={"email": email, "password": password})
+        if response.status_code != 200:
+            raise CloudScrapperError(f"Login failed: {response.text}", response.status_code)
+        token = response.json()["access_token"]
+        self.http.headers["Authorization"] = f"Bearer {token}"
+        return token
+
+    async def command(self, cmd: str, **payload) -> Dict[str, Any]:
+        """Run a sessions.* command and return its result."""
+        response = await self.call("POST", "/api/v1", params={"sync": "true"}, json={"cmd": cmd, **payload})
+        data = response.json()
+        if "error" in data:
+            raise CloudScrapperError(data["error"], response.status_code)
+        return data
+
+    async def create_session(self, session: Optional[str] = None, proxy: Optional[str] = None, tabs: int = 1) -> str:
+        payload = {key: value for key, value in (("session", session), ("proxy", proxy)) if value}
+        return (await self.command("sessions.create", tabs=tabs, **payload))["session"]
+
+    async def destroy_session(self, session: str):
+        await self.command("sessions.destroy", session=session)
+
+    async def list_sessions(self) -> List[str]:
+        return (await self.command("sessions.list"))["sessions"]
+
+    async def submit(self, url: str, **options) -> str:
+        """Queue a request.get and return its task id. Options are the /api/v1 fields (maxTimeout, extract, ...)."""
+        response = await self.call("POST", "/api/v1", params={"sync": "false"}, json={"cmd": "request.get", "url": url, **options})
+        data = response.json()
+        if "task_id" not in data:
+            raise CloudScrapperError(f"Unexpected response: {data}", response.status_code)
+        return data["task_id"]
+
+    async def wait(self, task_id: str, timeout: Optional[float] = None, url: Optional[str] = None) -> TaskResult:
+        """Long-poll a task until it settles, or until `timeout` seconds have passed."""
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            poll = LONG_POLL_SECONDS
+            if give_up_at is not None:
+                poll = max(0, min(poll, int(give_up_at - time.monotonic())))
+            response = await self.call("GET", f"/api/v1/tasks/{task_id}", params={"wait": "true", "timeout": poll})
+            if response.status_code != 200:
+                # The server answers unknown or already collected tasks with a redirect to its UI, not a 404
+                raise CloudScrapperError(f"Task {task_id} not found or already collected (HTTP {response.status_code})", response.status_code)
+            data = response.json()
+            if data.get("status") in FINAL_TASK_STATUSES:
+                return TaskResult.from_json(task_id, url, data.get("result") or {})
+            if give_up_at is not None and time.monotonic() >= give_up_at:
+                return TaskResult(task_id=task_id, status="timeout", url=url, error=f"Task still {data.get('status')}", raw=data)
+
+    async def get_body(self, task_id: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        """Page source of a task run with streamBody, optionally bytes start..end inclusive."""
+        headers = {"Range": f"bytes={start or 0}-{'' if end is None else end}"} if start is not None or end is not None else {}
+        response = await self.call("GET", f"/api/v1/tasks/{task_id}/body", headers=headers)
+        if response.status_code not in (200, 206):
+            raise CloudScrapperError(f"Body of task {task_id} not available: {response.text}", response.status_code)
+        return response.content
+
+    async def cancel(self, task_id: str) -> bool:
+        response = await self.call("DELETE", f"/api/v1/tasks/{task_id}")
+        return response.status_code == 200
+
+    async def get(self, url: str, **options) -> TaskResult:
+        """Fetch one page and wait for its result, resubmitting when over the user's quota."""
+        # The server enforces maxTimeout end to end, leave it room to report its own timeout
+        timeout = float(options.get("maxTimeout", 60)) + 30
+        for attempt in range(self.retries + 1):
+            task_id = await self.submit(url, **options)
+            result = await self.wait(task_id, timeout=timeout, url=url)
+            if "retryAfter" not in result.raw or attempt == self.retries:
+                return result
+            await asyncio.sleep(float(result.raw["retryAfter"]) + random.uniform(0, self.backoff))
+
+    async def map(self, urls: Iterable[str], **options) -> AsyncIterator[TaskResult]:
+        """Fetch many pages with at most `max_concurrency` in flight, yielding results as they complete.
+
+        Failures are yielded as TaskResult with ok False rather than raised, so
+        one bad URL does not stop a batch.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(url: str) -> TaskResult:
+            async with semaphore:
+                try:
+                    return await self.get(url, **options)
+                except CloudScrapperError as e:
+                    return TaskResult(task_id=None, status="error", url=url, error=str(e))
+
+        pending = set()
+        url_iter = iter(urls)
+        # Start tasks lazily so a generator of millions of URLs is never materialized
+        for url in url_iter:
+            pending.add(asyncio.create_task(run(url)))
+            if len(pending) >= self.max_concurrency * 2:
+                break
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+                for url in url_iter:
+                    pending.add(asyncio.create_task(run(url)))
+                    if len(pending) >= self.max_concurrency * 2:
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_many(self, urls: Iterable[str], **options) -> List[TaskResult]:
+        """Like `map`, but returns every result in the order of `urls`."""
+        urls = list(urls)
+        order = {}
+        for index, url in enumerate(urls):
+            order.setdefault(url, []).append(index)
+        results: List[Optional[TaskResult]] = [None] * len(urls)
+        async for result in self.map(urls, **options):
+            results[order[result.url].pop(0)] = result
+        return results
@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+class CloudScrapperError(Exception):
+    """The service could not be reached or kept failing after the retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class Solution:
+    url: str
+    status: int
+    headers: Dict[str, Any] = field(default_factory=dict)
+    response: Optional[str] = None
+    cookies: List[Dict[str, Any]] = field(default_factory=list)
+    user_agent: Optional[str] = None
+    response_values: List[Any] = field(default_factory=list)
+    engine: Optional[str] = None
+    extracted: Optional[Dict[str, Any]] = None
+    extract_errors: Optional[Dict[str, str]] = None
+    network: Optional[Dict[str, Any]] = None
+    escalation_reason: Optional[str] = None
+    cached: bool = False
+    cache_age: Optional[float] = None
+    # Set instead of `response` when the page was spooled, see AsyncClient.get_body
+    body: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Solution":
+        return cls(
+            url=data.get("url", ""),
+            status=data.get("status", 0),
+            headers=data.get("headers") or {},
+            response=data.get("response"),
+            cookies=data.get("cookies") or [],
+            user_agent=data.get("userAgent"),
+            response_values=data.get("response_values") or [],
+            engine=data.get("engine"),
+            extracted=data.get("extracted"),
+            extract_errors=data.get("extractErrors"),
+            network=data.get("network"),
+            escalation_reason=data.get("escalationReason"),
+            cached=bool(data.get("cached", False)),
+            cache_age=data.get("cacheAge"),
+            body=data.get("body"),
+        )
+
+    def cookie_dict(self) -> Dict[str, str]:
+        return {cookie["name"]: cookie["value"] for cookie in self.cookies}
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one request.get, successful or not."""
+
+    task_id: Optional[str]
+    # "ok", "error", "timeout" or "cancelled"
+    status: str
+    url: Optional[str] = None
+    solution: Optional[Solution] = None
+    error: Optional[str] = None
+    raw: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    @classmethod
+    def from_json(cls, task_id: Optional[str], url: Optional[str], data: Dict[str, Any]) -> "TaskResult":
+        # Timeouts carry the partial page gathered before the deadline as their solution
+        solution = Solution.from_json(data["solution"]) if data.get("solution") is not None else None
+        if data.get("status") == "cancelled":
+            return cls(task_id=task_id, status="cancelled", url=url, error=data.get("message"), raw=data)
+        if "error" in data:
+            status = "timeout" if data.get("status") == "timeout" else "error"
+            return cls(task_id=task_id, status=status, url=url, solution=solution, error=data["error"], raw=data)
+        return cls(task_id=task_id, status="ok", url=url, solution=solution, raw=data)
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from typing import Iterable, List, Optional
+from cloudscrapper_client.client import AsyncClient
+from cloudscrapper_client.models import TaskResult
+
+
+class Client:
+    """Blocking wrapper around AsyncClient for scripts and threaded code.
+
+    The async client lives on a private event loop in a daemon thread, so
+    the connection pool is kept between calls and `get_many` still runs its
+    requests concurrently. Safe to call from several threads at once.
+
+        with Client("http://localhost:8000") as client:
+            result = client.get("https://example.com")
+    """
+
+    def __init__(self, base_url: str, token: Optional[str] = None, **options):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="cloudscrapper-client", daemon=True)
+        self.thread.start()
+        self.client: AsyncClient = self.run(self.create(base_url, token, options))
+
+    @staticmethod
+    async def create(base_url: str, token: Optional[str], options) -> AsyncClient:
+        # httpx binds the pool to the loop it is created on
+        return AsyncClient(base_url, token=token, **options)
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def login(self, email: str, password: str) -> str:
+        return self.run(self.client.login(email, password))
+
+    def get(self, url: str, **options) -> TaskResult:
+        return self.run(self.client.get(url, **options))
+
+    def get_many(self, urls: Iterable[str], **options) -> List[TaskResult]:
+        return self.run(self.client.get_many(urls, **options))
+
+    def submit(self, url: str, **options) -> str:
+        return self.run(self.client.submit(url, **options))
+
+    def wait(self, task_id: str, timeout: Optional[float] = None) -> TaskResult:
+        return self.run(self.client.wait(task_id, timeout))
+
+    def get_body(self, task_id: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        return self.run(self.client.get_body(task_id, start, end))
+
+    def cancel(self, task_id: str) -> bool:
+        return self.run(self.client.cancel(task_id))
+
+    def create_session(self, session: Optional[str] = None, proxy: Optional[str] = None, tabs: int = 1) -> str:
+        return self.run(self.client.create_session(session, proxy, tabs))
+
+    def destroy_session(self, session: str):
+        self.run(self.client.destroy_session(session))
+
+    def list_sessions(self) -> List[str]:
+        return self.run(self.client.list_sessions())
@@ -1,41 +1,56 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.exceptions import HTTPException as StarletteHTTPException
-from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.openapi.utils import get_openapi
-from app.database import engine, init_db
-from app.models import Base
-from app.routes import router
-import nest_asyncio
+# Imported first so the startup report covers everything below
+from app.startup import startupTimer
+
+from dotenv import load_dotenv
+# Load .env before the app modules read their configuration at import time
+load_dotenv()
+
+with startupTimer.importing("fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+    from fastapi.exceptions import HTTPException as StarletteHTTPException
+with startupTimer.importing("app.database"):
+    from app.database import init_db
+with startupTimer.importing("app.routes"):
+    from app.routes import router
+from app.api.retention import RETENTION_INTERVAL, retentionLoop
+from app.api.search import backfillSearchIndex, setupSearchIndex
+from app.api.profiles import flushProfiles, profileFlushLoop
+from app.api.body_store import bodyExpiryLoop
+from app.database import engine
+from app.lifecycle import SHUTDOWN_GRACE_SECONDS, cleanupPreviousRun, lifecycle, removePidFile
+from app.routes import drain_tasks
+from app.browser_manager.manager import closeAllSessions
+from app.logging_config import setupLogging
+from app.static_files import CachedStaticFiles
 import asyncio
+import json
 import platform
 import sys
 import uvicorn
-from dotenv import load_dotenv
 import os
-from aiohttp import web
 import threading
-import yaml
 import logging
 from pathlib import Path
 from contextlib import asynccontextmanager
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+setupLogging()
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 # Configure the correct event loop policy
 if platform.system() == "Windows":
     if sys.version_info >= (3, 8):
         # Use the WindowsSelectorEventLoopPolicy to avoid NotImplementedError
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+# Apply nest_asyncio to allow nested event loops (seleniumbase runs its own loop inside each task's loop)
+if os.getenv("BROWSER_ENGINE", "seleniumbase") != "nodriver":
+    with startupTimer.importing("nest_asyncio"):
+        import nest_asyncio
+    nest_asyncio.apply()
 
 # Ensure static directory exists
 static_dir = Path(__file__).parent / "static"
@@ -59,23 +74,65 @@ if not index_path.exists():
 </body>
 </html>""")
 
-# Load OpenAPI spec from YAML file if it exists
+# OpenAPI spec from swagger.yaml, parsed on first use. The parsed document is
+# kept as JSON next to it, keyed by the YAML's mtime, so restarts skip PyYAML.
 swagger_yaml_path = os.path.join(os.path.dirname(__file__), "swagger.yaml")
+openapi_cache_path = os.getenv("OPENAPI_CACHE_PATH", os.path.join(os.path.dirname(__file__), ".openapi_cache.json"))
 openapi_schema = None
-if os.path.exists(swagger_yaml_path):
-    with open(swagger_yaml_path, "r") as file:
-        openapi_schema = yaml.safe_load(file)
+
+def load_openapi_schema():
+    global openapi_schema
+    if openapi_schema is not None:
+        return openapi_schema
+    mtime = os.path.getmtime(swagger_yaml_path)
+    try:
+        with open(openapi_cache_path, "r") as file:
+            cached = json.load(file)
+        if cached.get("mtime") == mtime:
+            openapi_schema = cached["schema"]
+            return openapi_schema
+    except (OSError, ValueError):
+        pass
+    with startupTimer.phase("parse swagger.yaml"):
+        import yaml
+        with open(swagger_yaml_path, "r") as file:
+            openapi_schema = yaml.safe_load(file)
+    try:
+        with open(openapi_cache_path, "w") as file:
+            json.dump({"mtime": mtime, "schema": openapi_schema}, file, default=str)
+    except OSError as e:
+        logger.warning(f"Could not write the OpenAPI cache: {e}")
+    return openapi_schema
+
+async def warm_up_browser_engine():
+    # Import the browser engine off the event loop so the first scrape does not pay for it
+    try:
+        with startupTimer.phase("browser engine warm-up"):
+            from app.browser_manager.manager import engineClass
+            await asyncio.to_thread(engineClass)
+    except Exception as e:
+        logger.error(f"Browser engine warm-up failed: {e}")
 
 # Define lifespan context manager (replacement for on_event)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup code (formerly in on_event("startup"))
     logger.info("Starting up application...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    with startupTimer.phase("orphan cleanup"):
+        # Browsers and profiles of a crashed run would otherwise live until the container restarts
+        await asyncio.to_thread(cleanupPreviousRun)
+    with startupTimer.phase("database setup"):
         await init_db()
-    logger.info(f"Static directory exists: {os.path.exists(str(static_dir))}")
-    logger.info(f"Static directory contents: {os.listdir(str(static_dir))}")
+        await setupSearchIndex()
+    backfill = asyncio.create_task(backfillSearchIndex())
+    warm_up = None
+    if os.getenv("BROWSER_WARMUP", "true") == "true":
+        warm_up = asyncio.create_task(warm_up_browser_engine())
+    retention = asyncio.create_task(retentionLoop()) if RETENTION_INTERVAL > 0 else None
+    profile_flush = asyncio.create_task(profileFlushLoop())
+    body_expiry = asyncio.create_task(bodyExpiryLoop())
+    startupTimer.markReady()
+    logger.info("Application ready", extra={"ready_ms": startupTimer.ready_at})
     logger.info(f"Swagger UI available at: http://0.0.0.0:8000/api/docs")
     logger.info(f"ReDoc available at: http://0.0.0.0:8000/api/redoc")
     
@@ -83,6 +140,25 @@ async def lifespan(app: FastAPI):
     
     # Shutdown code (formerly in on_event("shutdown"))
     logger.info("Shutting down application...")
+    lifecycle.beginDrain()
+    if warm_up is not None:
+        warm_up.cancel()
+    if retention is not None:
+        retention.cancel()
+    backfill.cancel()
+    body_expiry.cancel()
+    drained = await drain_tasks()
+    closed = await closeAllSessions()
+    profile_flush.cancel()
+    try:
+        # Outcomes of the drained tasks, written before the pool goes away
+        await flushProfiles()
+    except Exception as e:
+        logger.warning(f"Could not save domain profiles: {e}")
+    # Returns the pooled connections, every task has committed or been stopped by now
+    await engine.dispose()
+    removePidFile()
+    logger.info("Shutdown complete", extra={**drained, "sessions": closed})
 
 # Initialize FastAPI with lifespan
 app = FastAPI(
@@ -96,10 +172,8 @@ app = FastAPI(
 )
 
 # Override the OpenAPI schema with our custom schema
-if openapi_schema:
-    def custom_openapi():
-        return openapi_schema
-    app.openapi = custom_openapi
+if os.path.exists(swagger_yaml_path):
+    app.openapi = load_openapi_schema
 
 app.add_middleware(
     CORSMiddleware,
@@ -112,6 +186,14 @@ app.add_middleware(
 # Include API routes with a prefix
 app.include_router(router, prefix="/api")
 
+# Simple API health check endpoint, registered before the "/" mount which would shadow it
+@app.get("/api/healthcheck")
+async def healthcheck():
+    if lifecycle.draining:
+        # Load balancers stop sending traffic here while running tasks finish
+        return JSONResponse({"status": "draining", "message": "Server is shutting down"}, status_code=503)
+    return {"status": "ok", "message": "Server is running"}
+
 # Custom exception handler for 404 errors
 @app.exception_handler(StarletteHTTPException)
 async def custom_http_exception_handler(request, exc):
@@ -122,45 +204,32 @@ async def custom_http_exception_handler(request, exc):
         if request.url.path.startswith("/api/"):
             return {"detail": "Not Found"}
         
-        # For non-API routes, try to serve index.html
-        try:
-            index_html_path = os.path.join(static_dir, "index.html")
-            if os.path.exists(index_html_path):
-                with open(index_html_path, "r") as f:
-                    content = f.read()
-                return HTMLResponse(content=content)
-            else:
-                return HTMLResponse(content="<html><body><h1>404 Not Found</h1><p>The static file could not be found.</p></body></html>", status_code=404)
-        except Exception as e:
-            logger.error(f"Error serving index.html: {str(e)}")
-            return HTMLResponse(content=f"<html><body><h1>Error</h1><p>{str(e)}</p></body></html>", status_code=500)
+        # For non-API routes, serve the index.html held in memory
+        index = static_files.index()
+        if index is not None:
+            return static_files.response(request, index)
+        return HTMLResponse(content="<html><body><h1>404 Not Found</h1><p>The static file could not be found.</p></body></html>", status_code=404)
     
     # For other errors, use default exception handling
     raise exc
 
-# Mount static files directory
-try:
-    app.mount("/", StaticFiles(directory=str(static_dir), html=True), name="static")
-    logger.info(f"Mounted static files directory: {static_dir}")
-except Exception as e:
-    logger.error(f"Error mounting static files: {str(e)}")
+# Mount static files directory for screenshots, before "/" which matches every path
+if os.path.exists("screenshot"):
+    app.mount("/screenshots", StaticFiles(directory="screenshot"), name="screenshots")
+
+# Serve the dashboard from memory, precompressed and with cache validators
+static_files = CachedStaticFiles(str(static_dir))
+app.mount("/", static_files, name="static")
+logger.info(f"Mounted static files directory: {static_dir}")
 
 # on 404 error, serve index.html
 
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
     return RedirectResponse(url="/")
-# Mount static files directory for screenshots
-if os.path.exists("screenshot"):
-    app.mount("/screenshots", StaticFiles(directory="screenshot"), name="screenshots")
-
-# Simple API health check endpoint
-@app.get("/api/healthcheck")
-async def healthcheck():
-    return {"status": "ok", "message": "Server is running"}
 
 def run_fastapi():
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False, timeout_graceful_shutdown=SHUTDOWN_GRACE_SECONDS)
 
 async def main():
     # Démarrer FastAPI dans un thread séparé pour ne pas bloquer
@@ -178,4 +247,4 @@ async def main():
 if __name__ == "__main__":
     # Fix the uvicorn command to pass the application as an import string
     logger.info("Starting server...")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, timeout_graceful_shutdown=SHUTDOWN_GRACE_SECONDS)
\ No newline at end of file